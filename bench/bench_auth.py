@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de la capa de autenticación.
+
+Mide la latencia añadida por petición con la app ASGI llamada directamente
+(sin red ni servidor), comparando:
+
+  sin auth:  la app sola
+  antes:     AuthMiddleware sobre BaseHTTPMiddleware con comparación `!=`
+  después:   ApiKeyAuth (ASGI puro, claves con hash, compare_digest)
+
+Se mide una respuesta JSON corta y una respuesta en streaming de 50 trozos,
+como las SSE de streamable_http_app().
+
+    python bench/bench_auth.py [peticiones]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+os.environ.setdefault("WOO_URL", "http://fake-store.local")
+os.environ.setdefault("WOO_CONSUMER_KEY", "ck_fake")
+os.environ.setdefault("WOO_CONSUMER_SECRET", "cs_fake")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from starlette.applications import Starlette  # noqa: E402
+from starlette.middleware import Middleware  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from starlette.responses import JSONResponse, Response, StreamingResponse  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+from src.auth import ApiKeyAuth  # noqa: E402
+from src.config import hash_api_key  # noqa: E402
+
+API_KEY = "bench-key-0123456789"
+# Varias claves configuradas para que la búsqueda en tiempo constante recorra todas
+KEYS = {hash_api_key(f"otra-clave-{i}"): f"cliente-{i}" for i in range(4)}
+KEYS[hash_api_key(API_KEY)] = "bench"
+
+
+class LegacyAuthMiddleware(BaseHTTPMiddleware):
+    """Versión anterior de src/server.py"""
+
+    async def dispatch(self, request, call_next):
+        auth_header = request.headers.get("Authorization")
+        if not auth_header:
+            return Response(content='{"error": {"code": -32000, "message": "Missing API key"}}', status_code=401,
+                            media_type="application/json")
+        provided_key = auth_header[7:] if auth_header.startswith("Bearer ") else auth_header
+        if provided_key != API_KEY:
+            return Response(content='{"error": {"code": -32000, "message": "Invalid API key"}}', status_code=401,
+                            media_type="application/json")
+        return await call_next(request)
+
+
+async def ping(request):
+    return JSONResponse({"ok": True})
+
+
+async def stream(request):
+    async def chunks():
+        for i in range(50):
+            yield f"data: {i}\n\n"
+    return StreamingResponse(chunks(), media_type="text/event-stream")
+
+
+def build(middleware):
+    return Starlette(routes=[Route("/ping", ping), Route("/stream", stream)], middleware=middleware)
+
+
+APPS = {
+    "sin auth": build([]),
+    "antes": build([Middleware(LegacyAuthMiddleware)]),
+    "después": build([Middleware(ApiKeyAuth, keys=KEYS)]),
+}
+
+
+async def call(app, path: str) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"localhost"), (b"authorization", f"Bearer {API_KEY}".encode())],
+        "client": ("127.0.0.1", 1234), "server": ("localhost", 80),
+    }
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(app, path: str, n: int) -> float:
+    for _ in range(100):  # calentamiento
+        assert await call(app, path) == 200
+    start = time.perf_counter()
+    for _ in range(n):
+        await call(app, path)
+    return (time.perf_counter() - start) / n
+
+
+async def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print(f"{n} peticiones por caso, latencia media por petición")
+    for path in ("/ping", "/stream"):
+        base = await measure(APPS["sin auth"], path, n)
+        print(f"  {path:8} sin auth {base * 1e6:8.1f} µs")
+        for name in ("antes", "después"):
+            elapsed = await measure(APPS[name], path, n)
+            print(f"  {path:8} {name:8} {elapsed * 1e6:8.1f} µs  (+{(elapsed - base) * 1e6:.1f} µs)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark del camino caliente de las herramientas de listado.
+
+Mide el coste por cada 1000 productos de convertir el cuerpo HTTP de
+WooCommerce en el resultado MCP serializado, comparando:
+
+  antes:   json.loads + Product(**p) por registro + conversión genérica de
+           FastMCP (texto indentado por item, revalidación, model_dump) +
+           validación jsonschema del servidor lowlevel
+  después: jsonutil.loads (orjson si está instalado) + TypeAdapter de la
+           lista completa + CallToolResult construido una sola vez
+
+    python bench/bench_list_products.py [productos] [repeticiones]
+"""
+
+import json
+import os
+import random
+import sys
+import time
+from typing import List
+
+os.environ.setdefault("WOO_URL", "http://fake-store.local")
+os.environ.setdefault("WOO_CONSUMER_KEY", "ck_fake")
+os.environ.setdefault("WOO_CONSUMER_SECRET", "cs_fake")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import jsonschema  # noqa: E402
+from mcp.server.fastmcp.utilities.func_metadata import func_metadata  # noqa: E402
+from mcp.types import CallToolResult  # noqa: E402
+from src import jsonutil  # noqa: E402
+from src.models import Product  # noqa: E402
+from src.results import products_result  # noqa: E402
+from src.tools import mcp  # noqa: E402
+
+
+def fake_products(n: int) -> bytes:
+    """Cuerpo JSON como el que devuelve /products con la proyección _fields"""
+    random.seed(42)
+    products = []
+    for i in range(1, n + 1):
+        price = f"{random.uniform(5, 500):.2f}"
+        products.append({
+            "id": i,
+            "name": f"Producto de prueba {i}",
+            "price": price,
+            "regular_price": price,
+            "sale_price": "",
+            "stock_status": random.choice(["instock", "outofstock", "onbackorder"]),
+            "categories": [
+                {"id": c, "name": f"Categoría {c}", "slug": f"categoria-{c}"}
+                for c in random.sample(range(1, 30), 2)
+            ],
+        })
+    return json.dumps(products).encode()
+
+
+def legacy_list_products() -> List[Product]:
+    """Firma anterior: FastMCP convertía el resultado de forma genérica"""
+
+
+LEGACY = func_metadata(legacy_list_products)
+LEGACY_SCHEMA = LEGACY.output_schema
+CURRENT = mcp._tool_manager.get_tool("list_products").fn_metadata
+
+
+def before(body: bytes) -> str:
+    products = json.loads(body)
+    result = [Product(**p) for p in products]
+    unstructured, structured = LEGACY.convert_result(result)
+    jsonschema.validate(instance=structured, schema=LEGACY_SCHEMA)
+    return CallToolResult(content=list(unstructured), structuredContent=structured).model_dump_json(by_alias=True, exclude_none=True)
+
+
+def after(body: bytes) -> str:
+    products = jsonutil.loads(body)
+    result = CURRENT.convert_result(products_result(products))
+    return result.model_dump_json(by_alias=True, exclude_none=True)
+
+
+def measure(fn, body: bytes, repeat: int) -> float:
+    fn(body)  # calentamiento
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(body)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    body = fake_products(n)
+    scale = 1000 / n
+
+    print(f"{n} productos, {len(body) / 1024:.0f} KB, mejor de {repeat} (orjson: {'sí' if jsonutil.orjson else 'no'})")
+    decode_std = measure(json.loads, body, repeat)
+    decode_fast = measure(jsonutil.loads, body, repeat)
+    print(f"  decodificación JSON    stdlib {decode_std * scale * 1000:8.2f} ms   jsonutil {decode_fast * scale * 1000:8.2f} ms  por 1000")
+
+    old = measure(before, body, repeat)
+    new = measure(after, body, repeat)
+    print(f"  camino completo        antes  {old * scale * 1000:8.2f} ms   después  {new * scale * 1000:8.2f} ms  por 1000")
+    print(f"  mejora: {old / new:.1f}x, tamaño de respuesta {len(before(body)) / 1024:.0f} KB -> {len(after(body)) / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Tienda WooCommerce falsa para pruebas de carga.
+
+Implementa la parte de la API REST wc/v3 que usa el servidor (productos,
+pedidos, lotes, paginación con X-WP-Total, _fields, búsqueda, filtros y
+modified_after, after/before) sobre un catálogo generado de forma determinista. Permite
+inyectar latencia, errores 5xx y respuestas 429 con Retry-After.
+
+La usa bench/load_test.py dentro del propio proceso; también se puede
+levantar sola para apuntar a ella un servidor MCP ya en marcha:
+
+    python bench/fake_woo.py --port 8300 --products 5000 --latency 40
+    WOO_URL=http://127.0.0.1:8300 python -m src.server
+"""
+
+import argparse
+import asyncio
+import math
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+ADJECTIVES = ["rojo", "azul", "verde", "negro", "blanco", "dorado", "clásico", "moderno", "vintage", "deportivo"]
+NOUNS = ["camiseta", "pulsera", "taza", "mochila", "gorra", "sudadera", "bolso", "collar", "reloj", "cuaderno"]
+ORDER_STATUSES = ["pending", "processing", "on-hold", "completed", "cancelled", "refunded"]
+STOCK_STATUSES = ["instock", "instock", "instock", "outofstock", "onbackorder"]
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _gmt(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _parse_gmt(value: str) -> datetime:
+    moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+class FakeStore:
+    """Catálogo y pedidos en memoria con inyección de fallos configurable"""
+
+    def __init__(self, products: int = 1000, orders: int = 1000, latency_ms: float = 20.0, jitter_ms: float = 5.0,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, retry_after: float = 0.2, seed: int = 42):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.products = [self._product(i) for i in range(1, products + 1)]
+        self.orders = [self._order(i, products) for i in range(1, orders + 1)]
+        self.products_by_id = {p["id"]: p for p in self.products}
+        self.orders_by_id = {o["id"]: o for o in self.orders}
+        self.stats = {"requests": 0, "errors_injected": 0, "throttled": 0}
+
+    def _product(self, i: int) -> Dict[str, Any]:
+        rnd = self.random
+        price = f"{rnd.uniform(5, 500):.2f}"
+        on_sale = rnd.random() < 0.2
+        created = EPOCH + timedelta(minutes=i)
+        return {
+            "id": i,
+            "name": f"{rnd.choice(NOUNS).capitalize()} {rnd.choice(ADJECTIVES)} {i}",
+            "sku": f"SKU-{i:06d}",
+            "status": "publish",
+            "price": f"{float(price) * 0.8:.2f}" if on_sale else price,
+            "regular_price": price,
+            "sale_price": f"{float(price) * 0.8:.2f}" if on_sale else "",
+            "stock_status": rnd.choice(STOCK_STATUSES),
+            "categories": [{"id": c, "name": f"Categoría {c}", "slug": f"categoria-{c}"} for c in rnd.sample(range(1, 21), 2)],
+            "description": f"<p>Descripción del producto {i}</p>",
+            "short_description": "",
+            "date_created_gmt": _gmt(created),
+            "date_modified_gmt": _gmt(created),
+        }
+
+    def _order(self, i: int, products: int) -> Dict[str, Any]:
+        rnd = self.random
+        items = []
+        for _ in range(rnd.randint(1, 4)):
+            product_id, quantity = rnd.randint(1, max(products, 1)), rnd.randint(1, 3)
+            items.append({"product_id": product_id, "name": f"Producto {product_id}", "quantity": quantity,
+                          "total": f"{quantity * rnd.uniform(5, 200):.2f}"})
+        created = EPOCH + timedelta(hours=i)
+        return {
+            "id": i,
+            "status": rnd.choice(ORDER_STATUSES),
+            "total": f"{rnd.uniform(10, 900):.2f}",
+            "currency": "EUR",
+            "customer_id": rnd.randint(1, 200),
+            "line_items": items,
+            "date_created_gmt": _gmt(created),
+            "date_modified_gmt": _gmt(created),
+        }
+
+    async def _delay_and_fault(self) -> Optional[JSONResponse]:
+        """Latencia simulada y, según las tasas configuradas, un 429 o un 500 en lugar de la respuesta"""
+        self.stats["requests"] += 1
+        await asyncio.sleep(max(0.0, self.random.gauss(self.latency, self.jitter)))
+        roll = self.random.random()
+        if roll < self.throttle_rate:
+            self.stats["throttled"] += 1
+            return JSONResponse({"code": "too_many_requests", "message": "Demasiadas peticiones"}, status_code=429,
+                                headers={"Retry-After": str(self.retry_after)})
+        if roll < self.throttle_rate + self.error_rate:
+            self.stats["errors_injected"] += 1
+            return JSONResponse({"code": "internal_server_error", "message": "Error simulado"}, status_code=500)
+        return None
+
+    @staticmethod
+    def _project(item: Dict[str, Any], fields: Optional[str]) -> Dict[str, Any]:
+        if not fields:
+            return item
+        wanted = fields.split(",")
+        return {key: item[key] for key in wanted if key in item}
+
+    def _page(self, request: Request, items: List[Dict[str, Any]]) -> JSONResponse:
+        per_page = min(int(request.query_params.get("per_page", 10)), 100)
+        page = max(int(request.query_params.get("page", 1)), 1)
+        fields = request.query_params.get("_fields")
+        chunk = items[(page - 1) * per_page:page * per_page]
+        return JSONResponse([self._project(item, fields) for item in chunk], headers={
+            "X-WP-Total": str(len(items)),
+            "X-WP-TotalPages": str(math.ceil(len(items) / per_page) if items else 0),
+        })
+
+    @staticmethod
+    def _common_filters(request: Request, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        query = request.query_params
+        if "include" in query:
+            wanted = {int(i) for i in query["include"].split(",") if i}
+            items = [item for item in items if item["id"] in wanted]
+        if "modified_after" in query:
+            since = _parse_gmt(query["modified_after"])
+            items = [item for item in items if _parse_gmt(item["date_modified_gmt"]) > since]
+        # after/before filtran por fecha de creación, como en WooCommerce
+        if "after" in query:
+            after = _parse_gmt(query["after"])
+            items = [item for item in items if _parse_gmt(item["date_created_gmt"]) > after]
+        if "before" in query:
+            before = _parse_gmt(query["before"])
+            items = [item for item in items if _parse_gmt(item["date_created_gmt"]) < before]
+        return items
+
+    async def list_products(self, request: Request):
+        if (fault := await self._delay_and_fault()) is not None:
+            return fault
+        query = request.query_params
+        items = self._common_filters(request, self.products)
+        if "search" in query:
+            term = query["search"].lower()
+            items = [p for p in items if term in p["name"].lower() or term in p["sku"].lower()]
+        if "category" in query:
+            category = int(query["category"])
+            items = [p for p in items if any(c["id"] == category for c in p["categories"])]
+        if "stock_status" in query:
+            items = [p for p in items if p["stock_status"] == query["stock_status"]]
+        return self._page(request, items)
+
+    async def get_product(self, request: Request):
+        if (fault := await self._delay_and_fault()) is not None:
+            return fault
+        product = self.products_by_id.get(int(request.path_params["id"]))
+        if product is None:
+            return JSONResponse({"code": "woocommerce_rest_product_invalid_id", "message": "ID no válido."}, status_code=404)
+        return JSONResponse(self._project(product, request.query_params.get("_fields")))
+
+    async def list_orders(self, request: Request):
+        if (fault := await self._delay_and_fault()) is not None:
+            return fault
+        query = request.query_params
+        items = self._common_filters(request, self.orders)
+        if "customer" in query:
+            customer = int(query["customer"])
+            items = [o for o in items if o["customer_id"] == customer]
+        if query.get("status", "any") != "any":
+            items = [o for o in items if o["status"] == query["status"]]
+        return self._page(request, items)
+
+    async def get_order(self, request: Request):
+        if (fault := await self._delay_and_fault()) is not None:
+            return fault
+        order = self.orders_by_id.get(int(request.path_params["id"]))
+        if order is None:
+            return JSONResponse({"code": "woocommerce_rest_shop_order_invalid_id", "message": "ID no válido."}, status_code=404)
+        return JSONResponse(self._project(order, request.query_params.get("_fields")))
+
+    def _create_order(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        now = datetime.now(timezone.utc)
+        order = {
+            "id": len(self.orders) + 1,
+            "status": "pending",
+            "total": f"{sum(item.get('quantity', 1) * 10.0 for item in payload.get('line_items', [])):.2f}",
+            "currency": "EUR",
+            "customer_id": payload.get("customer_id", 0),
+            "line_items": payload.get("line_items", []),
+            "billing": payload.get("billing", {}),
+            "date_created_gmt": _gmt(now),
+            "date_modified_gmt": _gmt(now),
+        }
+        self.orders.append(order)
+        self.orders_by_id[order["id"]] = order
+        return order
+
+    async def create_order(self, request: Request):
+        if (fault := await self._delay_and_fault()) is not None:
+            return fault
+        order = self._create_order(await request.json())
+        return JSONResponse(self._project(order, request.query_params.get("_fields")), status_code=201)
+
+    async def batch_orders(self, request: Request):
+        if (fault := await self._delay_and_fault()) is not None:
+            return fault
+        payload = await request.json()
+        return JSONResponse({"create": [self._create_order(item) for item in payload.get("create", [])]})
+
+    def app(self) -> Starlette:
+        prefix = "/wp-json/wc/v3"
+        return Starlette(routes=[
+            Route(f"{prefix}/products", self.list_products),
+            Route(f"{prefix}/products/{{id:int}}", self.get_product),
+            Route(f"{prefix}/orders", self.list_orders, methods=["GET"]),
+            Route(f"{prefix}/orders", self.create_order, methods=["POST"]),
+            Route(f"{prefix}/orders/batch", self.batch_orders, methods=["POST"]),
+            Route(f"{prefix}/orders/{{id:int}}", self.get_order),
+        ])
+
+
+def add_store_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--products", type=int, default=1000, help="productos en el catálogo falso")
+    parser.add_argument("--orders", type=int, default=1000, help="pedidos en la tienda falsa")
+    parser.add_argument("--latency", type=float, default=20.0, help="latencia media por petición (ms)")
+    parser.add_argument("--jitter", type=float, default=5.0, help="desviación de la latencia (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fracción de peticiones que responden 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fracción de peticiones que responden 429")
+    parser.add_argument("--retry-after", type=float, default=0.2, help="Retry-After de los 429 (s)")
+
+
+def store_from_arguments(args: argparse.Namespace) -> FakeStore:
+    return FakeStore(args.products, args.orders, args.latency, args.jitter, args.error_rate, args.throttle_rate, args.retry_after)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Tienda WooCommerce falsa (wc/v3)")
+    parser.add_argument("--port", type=int, default=8300)
+    add_store_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(store_from_arguments(args).app(), host="127.0.0.1", port=args.port, log_level="warning")
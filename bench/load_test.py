@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga del endpoint /mcp contra una tienda WooCommerce falsa.
+
+Levanta la tienda falsa de bench/fake_woo.py en este proceso y el servidor
+MCP real (uvicorn src.server:app) en un subproceso apuntando a ella. Después
+abre N sesiones MCP concurrentes que llaman herramientas según una mezcla
+ponderada durante un tiempo fijo, y mide por herramienta el throughput y
+las latencias p50/p95/p99 de extremo a extremo.
+
+Los resultados se guardan en JSON. Con --baseline se comparan con una
+ejecución anterior y el script termina con código 1 si alguna métrica
+empeora más que --threshold (p. ej. 0.2 = un 20 %):
+
+    python bench/load_test.py --sessions 50 --duration 30 --output base.json
+    python bench/load_test.py --sessions 50 --duration 30 --baseline base.json
+
+La configuración del servidor (caché, límites, workers...) se toma del
+entorno como siempre, p. ej. `CACHE_ENABLED=false python bench/load_test.py`.
+Con --url se prueba un servidor ya en marcha, que debe apuntar a una tienda
+falsa levantada con `python bench/fake_woo.py`.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import uvicorn
+
+sys.path.insert(0, os.path.dirname(__file__))
+from fake_woo import ADJECTIVES, NOUNS, ORDER_STATUSES, FakeStore, add_store_arguments, store_from_arguments  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+HEADERS = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+PROTOCOL_VERSION = "2025-03-26"
+DEFAULT_MIX = "list_products=3,search_products=3,get_order=3,list_orders=1"
+# Métricas comparadas con la línea base: las de latencia empeoran al subir, el throughput al bajar
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+# Aumento absoluto de la tasa de errores que se considera regresión
+ERROR_RATE_MARGIN = 0.01
+
+
+def tool_arguments(args: argparse.Namespace) -> Dict[str, Callable[[random.Random], Dict[str, Any]]]:
+    """Generadores de argumentos por herramienta, dentro de los rangos del catálogo falso"""
+    pages = max(1, math.ceil(args.products / 20))
+    return {
+        "list_products": lambda rnd: {"per_page": 20, "page": rnd.randint(1, pages)},
+        "search_products": lambda rnd: {"query": rnd.choice(NOUNS + ADJECTIVES)},
+        "get_order": lambda rnd: {"order_id": rnd.randint(1, args.orders)},
+        "get_orders": lambda rnd: {"order_ids": rnd.sample(range(1, args.orders + 1), min(5, args.orders))},
+        "list_orders": lambda rnd: {"status": rnd.choice(ORDER_STATUSES), "per_page": 10},
+        "create_order": lambda rnd: {
+            "customer_id": rnd.randint(1, 200),
+            "line_items": [{"product_id": rnd.randint(1, args.products), "quantity": 1}],
+            "billing": {"first_name": "Carga", "last_name": "Prueba", "email": "carga@example.com"},
+        },
+    }
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, weight = item.split("=", 1)
+            mix[name.strip()] = float(weight)
+    return mix
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_store(store: FakeStore) -> Tuple[uvicorn.Server, int]:
+    """Sirve la tienda falsa en un hilo con su propio bucle de eventos"""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(store.app(), log_level="warning", lifespan="off"))
+    threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, sock.getsockname()[1]
+
+
+def start_mcp_server(store_port: int, api_key: str, workers: int, log_path: str) -> Tuple[subprocess.Popen, str]:
+    """Arranca el servidor MCP real en un subproceso apuntando a la tienda falsa"""
+    port = free_port()
+    env = {
+        **os.environ,
+        "WOO_URL": f"http://127.0.0.1:{store_port}",
+        "WOO_CONSUMER_KEY": "ck_load_test",
+        "WOO_CONSUMER_SECRET": "cs_load_test",
+        "MCP_API_KEY": api_key,
+        "MCP_API_KEYS": "",
+        "MCP_WORKERS": str(workers),
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+    }
+    if workers > 1 and not env.get("MCP_SESSION_STORE") and env.get("MCP_STATELESS", "false").lower() not in ("1", "true", "yes"):
+        env["MCP_SESSION_STORE"] = f"sqlite:{os.path.join(tempfile.gettempdir(), f'load_test_sessions_{port}.db')}"
+    log = open(log_path, "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+async def wait_ready(url: str, api_key: str, process: Optional[subprocess.Popen], timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process is not None and process.poll() is not None:
+                raise RuntimeError(f"El servidor MCP terminó con código {process.returncode}")
+            try:
+                await client.get(f"{url}/upstream/status", headers={"Authorization": f"Bearer {api_key}"})
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"El servidor MCP no respondió en {timeout:.0f} s")
+
+
+def rpc_result(response: httpx.Response) -> Optional[Dict[str, Any]]:
+    """Mensaje JSON-RPC de respuesta, tanto en SSE como en JSON"""
+    if response.headers.get("content-type", "").startswith("application/json"):
+        return response.json()
+    message = None
+    for line in response.text.splitlines():
+        if line.startswith("data: "):
+            message = json.loads(line[6:])
+    return message
+
+
+class Session:
+    """Una sesión MCP que llama herramientas en bucle"""
+
+    def __init__(self, client: httpx.AsyncClient, url: str, api_key: str):
+        self.client = client
+        self.url = f"{url.rstrip('/')}/mcp"
+        self.headers = {**HEADERS, "Authorization": f"Bearer {api_key}"}
+        self.next_id = 1
+
+    async def _post(self, body: Dict[str, Any]) -> httpx.Response:
+        return await self.client.post(self.url, json=body, headers=self.headers)
+
+    async def initialize(self):
+        self.headers.pop("Mcp-Session-Id", None)
+        response = await self._post({"jsonrpc": "2.0", "id": 0, "method": "initialize", "params": {
+            "protocolVersion": PROTOCOL_VERSION, "capabilities": {}, "clientInfo": {"name": "load-test", "version": "1"}}})
+        response.raise_for_status()
+        if "mcp-session-id" in response.headers:
+            self.headers["Mcp-Session-Id"] = response.headers["mcp-session-id"]
+        await self._post({"jsonrpc": "2.0", "method": "notifications/initialized"})
+
+    async def call(self, name: str, arguments: Dict[str, Any]) -> Tuple[bool, str]:
+        """(éxito, motivo del error) de una llamada a herramienta"""
+        self.next_id += 1
+        response = await self._post({"jsonrpc": "2.0", "id": self.next_id, "method": "tools/call",
+                                     "params": {"name": name, "arguments": arguments}})
+        if response.status_code == 404:
+            # Sesión caducada o desconocida: se abre otra para las siguientes llamadas
+            await self.initialize()
+            return False, "http_404"
+        if response.status_code != 200:
+            return False, f"http_{response.status_code}"
+        message = rpc_result(response)
+        if message is None or "error" in message:
+            return False, "rpc_error"
+        if message["result"].get("isError"):
+            return False, "tool_error"
+        return True, ""
+
+
+async def run_session(session: Session, mix: Dict[str, float], generators, rnd: random.Random,
+                      warmup_end: float, end: float, samples: List[Tuple[str, float, bool, str]]):
+    names, weights = list(mix), list(mix.values())
+    await session.initialize()
+    while time.perf_counter() < end:
+        name = rnd.choices(names, weights)[0]
+        t0 = time.perf_counter()
+        try:
+            ok, reason = await session.call(name, generators[name](rnd))
+        except httpx.HTTPError as e:
+            ok, reason = False, type(e).__name__
+        t1 = time.perf_counter()
+        if t0 >= warmup_end and t1 <= end:
+            samples.append((name, t1 - t0, ok, reason))
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Percentil por rango más cercano"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def summarize(samples: List[Tuple[str, float, bool, str]], seconds: float) -> Dict[str, Any]:
+    latencies = sorted(s[1] * 1000 for s in samples)
+    errors: Dict[str, int] = defaultdict(int)
+    for _, _, ok, reason in samples:
+        if not ok:
+            errors[reason] += 1
+    count = len(samples)
+    return {
+        "requests": count,
+        "errors": sum(errors.values()),
+        "error_rate": round(sum(errors.values()) / count, 4) if count else 0.0,
+        "error_reasons": dict(errors),
+        "throughput_rps": round(count / seconds, 2) if seconds else 0.0,
+        "mean_ms": round(sum(latencies) / count, 2) if count else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Regresiones de `results` frente a `baseline` mayores que el umbral"""
+    regressions = []
+    groups = [("total", results["total"], baseline.get("total", {}))]
+    groups += [(name, stats, baseline.get("tools", {}).get(name)) for name, stats in results["tools"].items()]
+    for name, current, base in groups:
+        if not base:
+            continue
+        for metric in LATENCY_METRICS:
+            if base.get(metric) and current[metric] > base[metric] * (1 + threshold):
+                regressions.append(f"{name}: {metric} {base[metric]:.1f} -> {current[metric]:.1f} ms")
+        if base.get("throughput_rps") and current["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{name}: throughput {base['throughput_rps']:.1f} -> {current['throughput_rps']:.1f} req/s")
+        if current["error_rate"] > base.get("error_rate", 0.0) + ERROR_RATE_MARGIN:
+            regressions.append(f"{name}: errores {base.get('error_rate', 0.0):.1%} -> {current['error_rate']:.1%}")
+    return regressions
+
+
+def print_table(results: Dict[str, Any], baseline: Optional[Dict[str, Any]]):
+    print(f"\n{'herramienta':18} {'peticiones':>10} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errores':>8}")
+    rows = [*sorted(results["tools"].items()), ("total", results["total"])]
+    for name, stats in rows:
+        print(f"{name:18} {stats['requests']:>10} {stats['throughput_rps']:>8.1f} {stats['p50_ms']:>8.1f} "
+              f"{stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} {stats['error_rate']:>8.1%}")
+        base = (baseline or {}).get("total") if name == "total" else (baseline or {}).get("tools", {}).get(name)
+        if base:
+            print(f"{'  (base)':18} {base['requests']:>10} {base['throughput_rps']:>8.1f} {base['p50_ms']:>8.1f} "
+                  f"{base['p95_ms']:>8.1f} {base['p99_ms']:>8.1f} {base['error_rate']:>8.1%}")
+    upstream = results.get("upstream")
+    if upstream and results["total"]["requests"]:
+        print(f"\nTienda falsa: {upstream['requests']} peticiones "
+              f"({upstream['requests'] / results['total']['requests']:.2f} por llamada), "
+              f"{upstream['throttled']} respuestas 429, {upstream['errors_injected']} errores 500 inyectados")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def load(args: argparse.Namespace, url: str, api_key: str, store: Optional[FakeStore]) -> Dict[str, Any]:
+    mix = parse_mix(args.mix)
+    generators = tool_arguments(args)
+    unknown = set(mix) - set(generators)
+    if unknown:
+        raise SystemExit(f"Herramientas sin generador de argumentos: {', '.join(sorted(unknown))}")
+
+    samples: List[Tuple[str, float, bool, str]] = []
+    limits = httpx.Limits(max_connections=args.sessions, max_keepalive_connections=args.sessions)
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        warmup_end = time.perf_counter() + args.warmup
+        end = warmup_end + args.duration
+        upstream_before = dict(store.stats) if store else None
+        tasks = [run_session(Session(client, url, api_key), mix, generators, random.Random(args.seed + i),
+                             warmup_end, end, samples) for i in range(args.sessions)]
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+    failed = [o for o in outcomes if isinstance(o, BaseException)]
+    if failed:
+        print(f"{len(failed)} sesiones fallaron: {failed[0]!r}")
+
+    by_tool: Dict[str, List] = defaultdict(list)
+    for sample in samples:
+        by_tool[sample[0]].append(sample)
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "config": {
+            "url": args.url, "sessions": args.sessions, "duration": args.duration, "warmup": args.warmup,
+            "mix": mix, "workers": args.workers, "products": args.products, "orders": args.orders,
+            "latency_ms": args.latency, "jitter_ms": args.jitter, "error_rate": args.error_rate,
+            "throttle_rate": args.throttle_rate, "retry_after": args.retry_after,
+        },
+        "total": summarize(samples, args.duration),
+        "tools": {name: summarize(tool_samples, args.duration) for name, tool_samples in sorted(by_tool.items())},
+    }
+    if store is not None:
+        results["upstream"] = {key: store.stats[key] - upstream_before[key] for key in store.stats}
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga del endpoint /mcp")
+    parser.add_argument("--sessions", type=int, default=20, help="sesiones MCP concurrentes")
+    parser.add_argument("--duration", type=float, default=20.0, help="segundos medidos")
+    parser.add_argument("--warmup", type=float, default=3.0, help="segundos iniciales sin medir")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="herramientas y pesos, p. ej. 'get_order=3,list_orders=1'")
+    parser.add_argument("--workers", type=int, default=1, help="workers de uvicorn del servidor MCP")
+    parser.add_argument("--timeout", type=float, default=60.0, help="timeout por llamada (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url", help="servidor MCP ya en marcha en lugar de arrancar uno")
+    parser.add_argument("--api-key", default=os.environ.get("MCP_API_KEY"), help="clave para --url")
+    parser.add_argument("--output", help="fichero JSON de resultados (por defecto bench/results/load_test-<fecha>.json)")
+    parser.add_argument("--baseline", help="resultados anteriores con los que comparar")
+    parser.add_argument("--threshold", type=float, default=0.2, help="empeoramiento relativo tolerado frente a la base")
+    add_store_arguments(parser)
+    args = parser.parse_args()
+
+    store = process = None
+    fake_server = None
+    log_path = os.path.join(tempfile.gettempdir(), f"load_test_server_{os.getpid()}.log")
+    if args.url:
+        url, api_key = args.url, args.api_key or ""
+    else:
+        store = store_from_arguments(args)
+        fake_server, store_port = start_fake_store(store)
+        api_key = secrets.token_urlsafe(24)
+        process, url = start_mcp_server(store_port, api_key, args.workers, log_path)
+    try:
+        asyncio.run(wait_ready(url, api_key, process))
+        print(f"{args.sessions} sesiones contra {url} durante {args.duration:.0f} s "
+              f"(+{args.warmup:.0f} s de calentamiento), mezcla {args.mix}")
+        results = asyncio.run(load(args, url, api_key, store))
+    except RuntimeError as e:
+        print(e)
+        if process is not None and os.path.exists(log_path):
+            print(open(log_path).read()[-4000:])
+        return 2
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=15)
+        if fake_server is not None:
+            fake_server.should_exit = True
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+
+    output = args.output or os.path.join(ROOT, "bench", "results",
+                                         f"load_test-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResultados en {output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegresiones por encima del {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nSin regresiones por encima del {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
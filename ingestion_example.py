@@ -1,177 +1,257 @@
 #!/usr/bin/env python3
 """
-Ejemplo de ingesta de productos desde MCP WooCommerce
-Formato correcto para evitar error 406 Not Acceptable
+Ingesta de productos desde MCP WooCommerce
+
+Descarga el catálogo completo con list_products repartiendo las páginas
+entre varias sesiones MCP concurrentes del cliente asíncrono src.client
+(que procesa las respuestas SSE a medida que llegan y reabre las sesiones
+caducadas). Los registros se escriben en NDJSON o CSV
+en orden de página en cuanto cada página está completa. Tras cada página
+escrita se guarda un checkpoint, de modo que una ejecución interrumpida
+continúa donde lo dejó:
+
+    python ingestion_example.py --output productos.ndjson
+    python ingestion_example.py --output productos.csv --sessions 4 --per-page 100
+    python ingestion_example.py --output productos.ndjson --restart   # ignora el checkpoint
 """
 
-import os
+import argparse
+import asyncio
+import csv
+import io
 import json
-import requests
-from typing import Dict, Any, List
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
 from dotenv import load_dotenv
 
+from src.client import MCPError, WooMCPClient
+
 # Load environment variables
 load_dotenv()
 
-class MCPIngestionClient:
-    """Cliente para ingesta de datos desde MCP WooCommerce"""
-
-    def __init__(self, server_url: str, api_key: str):
-        self.server_url = server_url
-        self.api_key = api_key
-        self.session = requests.Session()
-        self.session.headers.update({
-            "Content-Type": "application/json",
-            "Accept": "application/json, text/event-stream"
-        })
-        if api_key:
-            self.session.headers.update({"Authorization": f"Bearer {api_key}"})
-
-        self.session_id = None
-        self.request_id = 1
-
-    def _next_request_id(self) -> int:
-        """Generar ID único para cada request"""
-        self.request_id += 1
-        return self.request_id - 1
-
-    def _parse_sse_response(self, response: requests.Response) -> Dict[str, Any]:
-        """Parsear respuesta SSE del servidor MCP"""
-        if response.status_code != 200:
-            return {
-                "error": {
-                    "code": response.status_code,
-                    "message": f"HTTP {response.status_code}: {response.text}"
-                }
-            }
-
-        text = response.text.strip()
-        if not text:
-            return {"error": {"message": "Respuesta vacía del servidor"}}
-
-        # Extraer línea de datos de SSE
-        for line in text.split('\n'):
-            if line.startswith('data: '):
-                json_str = line[6:]  # Remover 'data: '
-                try:
-                    return json.loads(json_str)
-                except json.JSONDecodeError as e:
-                    return {"error": {"message": f"JSON inválido: {e}"}}
-
-        return {"error": {"message": "Formato de respuesta desconocido"}}
-
-    def initialize_session(self) -> bool:
-        """Inicializar sesión MCP"""
-        payload = {
-            "jsonrpc": "2.0",
-            "id": self._next_request_id(),
-            "method": "initialize",
-            "params": {
-                "protocolVersion": "2024-11-05",
-                "capabilities": {},
-                "clientInfo": {"name": "ingestion-client", "version": "1.0.0"}
-            }
-        }
-
-        response = self.session.post(self.server_url, json=payload)
-
-        if response.status_code == 200:
-            # Extraer session ID de headers
-            session_header = response.headers.get('Mcp-Session-Id')
-            if session_header:
-                self.session_id = session_header
-                self.session.headers.update({"Mcp-Session-Id": self.session_id})
-                return True
-
-        return False
-
-    def get_products(self, per_page: int = 50, page: int = 1) -> List[Dict[str, Any]]:
-        """Obtener lista de productos"""
-        if not self.session_id:
-            raise Exception("Sesión no inicializada. Llama a initialize_session() primero.")
-
-        payload = {
-            "jsonrpc": "2.0",
-            "id": self._next_request_id(),
-            "method": "tools/call",
-            "params": {
-                "name": "list_products",
-                "arguments": {
-                    "per_page": per_page,
-                    "page": page
-                }
-            }
-        }
-
-        response = self.session.post(self.server_url, json=payload)
-        result = self._parse_sse_response(response)
-
-        if "error" in result:
-            raise Exception(f"Error en la consulta: {result['error']}")
-
-        # Extraer productos de la respuesta estructurada
-        if "result" in result and "structuredContent" in result["result"]:
-            return result["result"]["structuredContent"].get("result", [])
-
-        return []
-
-
-def main():
+PRODUCT_FIELDS = ["id", "name", "price", "regular_price", "sale_price", "stock_status", "categories"]
+PAGE_RETRIES = 3
+
+
+class NDJSONSink:
+    """Un producto JSON por línea"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+
+    def open(self, offset: int):
+        """Abrir para añadir, descartando lo escrito después del último checkpoint"""
+        self.file = open(self.path, "a+b")
+        self.file.truncate(offset)
+        self.file.seek(offset)
+
+    def write(self, records: List[Dict[str, Any]]):
+        self.file.write(b"".join(json.dumps(record, ensure_ascii=False).encode() + b"\n" for record in records))
+
+    def commit(self) -> int:
+        """Volcar a disco y devolver el tamaño confirmado"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class CSVSink(NDJSONSink):
+    """Una fila por producto; las columnas anidadas (categorías...) van como JSON"""
+
+    def __init__(self, path: str, fields: List[str]):
+        super().__init__(path)
+        self.fields = fields
+
+    def open(self, offset: int):
+        super().open(offset)
+        if offset == 0:
+            self._write_rows([self.fields])
+
+    def _write_rows(self, rows: List[List[Any]]):
+        text = io.StringIO()
+        csv.writer(text).writerows(rows)
+        self.file.write(text.getvalue().encode())
+
+    def write(self, records: List[Dict[str, Any]]):
+        self._write_rows([[_cell(record.get(field)) for field in self.fields] for record in records])
+
+
+def _cell(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return "" if value is None else value
+
+
+class Checkpoint:
+    """Última página escrita y confirmada en disco, con el tamaño del fichero en ese punto"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self, state: Dict[str, Any]):
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(state, f)
+        os.replace(temporary, self.path)
+
+
+class Ingestion:
+    """Reparte las páginas entre las sesiones y escribe en orden según se completan"""
+
+    def __init__(self, client: WooMCPClient, sink: NDJSONSink, checkpoint: Checkpoint,
+                 state: Dict[str, Any], per_page: int, fields: Optional[List[str]], workers: int):
+        self.client = client
+        self.sink = sink
+        self.checkpoint = checkpoint
+        self.state = state
+        self.per_page = per_page
+        self.fields = fields
+        self.workers = workers
+        self.next_page = state["page"] + 1
+        self.next_to_write = state["page"] + 1
+        self.last_page: Optional[int] = None
+        self.finished: Dict[int, List[Dict[str, Any]]] = {}
+        self.records_this_run = 0
+
+    async def _fetch(self, page: int) -> List[Dict[str, Any]]:
+        options = {"fields": self.fields} if self.fields else {}
+        for attempt in range(PAGE_RETRIES + 1):
+            try:
+                products = await self.client.list_products(self.per_page, page, **options)
+                return [product.model_dump() for product in products]
+            except (httpx.HTTPError, MCPError) as e:
+                if attempt == PAGE_RETRIES:
+                    raise RuntimeError(f"Página {page}: {e}") from e
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+    def _write_ready(self):
+        """Escribir las páginas contiguas ya descargadas y guardar el checkpoint tras cada una"""
+        while self.next_to_write in self.finished and (self.last_page is None or self.next_to_write <= self.last_page):
+            records = self.finished.pop(self.next_to_write)
+            self.sink.write(records)
+            self.state.update(page=self.next_to_write, offset=self.sink.commit(), records=self.state["records"] + len(records))
+            self.checkpoint.save(self.state)
+            self.records_this_run += len(records)
+            self.next_to_write += 1
+
+    async def _worker(self):
+        while self.last_page is None or self.next_page <= self.last_page:
+            page = self.next_page
+            self.next_page += 1
+            records = await self._fetch(page)
+            if len(records) < self.per_page:
+                # Página incompleta: es la última
+                self.last_page = page if self.last_page is None else min(self.last_page, page)
+            self.finished[page] = records
+            self._write_ready()
+
+    async def run(self):
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+        self.state["complete"] = True
+        self.checkpoint.save(self.state)
+
+
+async def report(ingestion: Ingestion, started: float, every: float = 2.0):
+    while True:
+        await asyncio.sleep(every)
+        elapsed = time.monotonic() - started
+        print(f"  📦 {ingestion.state['records']} productos, página {ingestion.state['page']}, "
+              f"{ingestion.records_this_run / elapsed:.0f} registros/s")
+
+
+async def ingest(args: argparse.Namespace, api_key: Optional[str]) -> int:
+    fields = args.fields.split(",") if args.fields else None
+    checkpoint = Checkpoint(args.checkpoint or f"{args.output}.checkpoint")
+    params = {"output": os.path.abspath(args.output), "per_page": args.per_page, "fields": fields}
+    state = None if args.restart else checkpoint.load()
+    if state is not None:
+        if state.get("params") != params:
+            print(f"❌ El checkpoint {checkpoint.path} es de otra configuración; usa --restart para empezar de cero")
+            return 1
+        if state.get("complete"):
+            print(f"✅ Ingesta ya completada ({state['records']} productos); usa --restart para repetirla")
+            return 0
+        print(f"↩️  Reanudando tras la página {state['page']} ({state['records']} productos ya escritos)")
+    else:
+        state = {"params": params, "page": 0, "offset": 0, "records": 0, "complete": False}
+
+    if args.output.endswith(".csv"):
+        sink = CSVSink(args.output, PRODUCT_FIELDS + [f for f in fields or [] if f not in PRODUCT_FIELDS])
+    else:
+        sink = NDJSONSink(args.output)
+    sink.open(state["offset"])
+
+    async with WooMCPClient(args.server, api_key, sessions=args.sessions, max_in_flight=args.in_flight,
+                            timeout=args.timeout, client_name="ingestion-client") as client:
+        ingestion = Ingestion(client, sink, checkpoint, state, args.per_page, fields, args.sessions * args.in_flight)
+        started = time.monotonic()
+        reporter = asyncio.create_task(report(ingestion, started))
+        try:
+            await ingestion.run()
+        except RuntimeError as e:
+            print(f"❌ Error durante la ingesta: {e}")
+            print(f"   Progreso guardado hasta la página {state['page']}; vuelve a ejecutar el comando para reanudar")
+            return 1
+        finally:
+            reporter.cancel()
+            sink.close()
+
+    elapsed = time.monotonic() - started
+    print(f"✅ {state['records']} productos en {args.output} ({state['page']} páginas); "
+          f"{ingestion.records_this_run} en esta ejecución, {elapsed:.1f} s, "
+          f"{ingestion.records_this_run / elapsed if elapsed else 0:.0f} registros/s")
+    return 0
+
+
+def main() -> int:
     """Función principal de ingesta"""
+    parser = argparse.ArgumentParser(description="Ingesta del catálogo de productos vía MCP")
+    parser.add_argument("--server", default="http://localhost:8200/mcp", help="URL del endpoint MCP")
+    parser.add_argument("--output", default="productos.ndjson", help="fichero de salida (.ndjson o .csv)")
+    parser.add_argument("--sessions", type=int, default=3, help="sesiones MCP concurrentes")
+    parser.add_argument("--in-flight", type=int, default=2, help="páginas en curso por sesión")
+    parser.add_argument("--per-page", type=int, default=100, help="productos por página (máx. 100)")
+    parser.add_argument("--fields", help="campos adicionales separados por comas, p. ej. sku,permalink")
+    parser.add_argument("--checkpoint", help="fichero de checkpoint (por defecto <output>.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="ignorar el checkpoint y empezar de cero")
+    parser.add_argument("--timeout", type=float, default=60.0, help="timeout por petición (s)")
+    args = parser.parse_args()
 
-    # Configuración
-    server_url = "http://localhost:8200/mcp"
     api_key = os.getenv("MCP_API_KEY")
-
     if not api_key:
         print("❌ Error: MCP_API_KEY no configurada en .env")
-        return
+        return 1
 
     print("🔄 Iniciando ingesta de productos desde MCP WooCommerce")
-    print(f"Servidor: {server_url}")
-    print()
-
+    print(f"Servidor: {args.server}")
     try:
-        # Crear cliente
-        client = MCPIngestionClient(server_url, api_key)
-
-        # Inicializar sesión
-        print("📡 Inicializando sesión MCP...")
-        if not client.initialize_session():
-            print("❌ Error: No se pudo inicializar sesión")
-            return
-
-        print(f"✅ Sesión inicializada. Session ID: {client.session_id}")
-        print()
-
-        # Obtener productos
-        print("🛍️  Consultando productos...")
-        products = client.get_products(per_page=50, page=1)
-
-        print(f"📦 Se obtuvieron {len(products)} productos")
-        print()
-
-        # Procesar productos (aquí puedes agregar tu lógica de ingesta)
-        print("📊 Procesando productos...")
-
-        for i, product in enumerate(products[:5], 1):  # Mostrar primeros 5
-            print(f"  {i}. {product.get('name', 'N/A')} - ${product.get('price', 'N/A')} ({product.get('stock_status', 'N/A')})")
-
-        if len(products) > 5:
-            print(f"  ... y {len(products) - 5} productos más")
-
-        print()
-        print("✅ Ingesta completada exitosamente!")
-
-        # Aquí puedes agregar código para:
-        # - Guardar en base de datos
-        # - Exportar a CSV/JSON
-        # - Procesar datos adicionales
-        # - etc.
-
-    except Exception as e:
-        print(f"❌ Error durante la ingesta: {e}")
+        return asyncio.run(ingest(args, api_key))
+    except KeyboardInterrupt:
+        print("\n⏸️  Interrumpida; vuelve a ejecutar el comando para reanudar desde el último checkpoint")
+        return 130
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,313 @@
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional, Set, Tuple
+from .config import ANALYTICS_CACHE_DAYS, ANALYTICS_CACHE_TTL, ANALYTICS_PAGE_SIZE, PAGINATION_CONCURRENCY, logger
+from .models import OrdersSummary, ProductSales, SummaryGroup
+from .woo_client import iter_pages
+
+GROUP_BY = ("status", "day", "week", "month", "customer", "product")
+# Only what the aggregates need is requested from WooCommerce
+ORDER_FIELDS = "id,status,total,currency,customer_id,line_items,date_created_gmt"
+DAY = timedelta(days=1)
+# A day's aggregate is cached once the day ended this long ago, leaving room for late writes
+CLOSE_DELAY = timedelta(minutes=15)
+# Uncached days are fetched in ranges of at most this many days, several ranges at a time
+FETCH_CHUNK_DAYS = 7
+CENT = Decimal("0.01")
+
+# [orders, revenue, units]
+Totals = List[Any]
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _money(value: Any) -> Decimal:
+    try:
+        return Decimal(str(value or "0"))
+    except InvalidOperation:
+        return Decimal(0)
+
+def _totals() -> Totals:
+    return [0, Decimal(0), 0]
+
+def _add(target: Totals, orders: int, revenue: Decimal, units: int):
+    target[0] += orders
+    target[1] += revenue
+    target[2] += units
+
+def _parse_bound(value: str, end: bool) -> datetime:
+    """UTC datetime for a range bound; a plain date as `date_to` includes that whole day"""
+    value = value.strip()
+    try:
+        if len(value) == 10:
+            day = datetime.strptime(value, "%Y-%m-%d")
+            return day + DAY if end else day
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Invalid date {value!r}; use YYYY-MM-DD or an ISO 8601 datetime") from None
+    return moment.astimezone(timezone.utc).replace(tzinfo=None) if moment.tzinfo else moment
+
+def _created(order: Dict[str, Any]) -> Optional[datetime]:
+    value = order.get("date_created_gmt")
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.rstrip("Z"))
+    except ValueError:
+        return None
+
+class StatusAggregate:
+    """Totals of the orders of one status on one day, broken down by product and customer, and their currencies"""
+    __slots__ = ("totals", "products", "customers", "currencies")
+
+    def __init__(self):
+        self.totals = _totals()
+        self.products: Dict[int, Totals] = {}
+        self.customers: Dict[int, Totals] = {}
+        self.currencies: Set[str] = set()
+
+class DayAggregate:
+    """Mergeable aggregate of one UTC day of orders; any group_by can be derived from it"""
+    __slots__ = ("statuses", "names")
+
+    def __init__(self):
+        self.statuses: Dict[str, StatusAggregate] = {}
+        self.names: Dict[int, str] = {}
+
+    def add(self, order: Dict[str, Any]):
+        aggregate = self.statuses.setdefault(order.get("status") or "unknown", StatusAggregate())
+        units = 0
+        seen: Set[int] = set()
+        for item in order.get("line_items") or []:
+            quantity = int(item.get("quantity") or 0)
+            units += quantity
+            product_id = item.get("product_id")
+            if product_id is None:
+                continue
+            # Orders count once per product even when it appears on several lines
+            _add(aggregate.products.setdefault(product_id, _totals()), 0 if product_id in seen else 1,
+                 _money(item.get("total")), quantity)
+            seen.add(product_id)
+            if item.get("name"):
+                self.names[product_id] = item["name"]
+        revenue = _money(order.get("total"))
+        _add(aggregate.totals, 1, revenue, units)
+        # Guest orders have customer_id 0
+        _add(aggregate.customers.setdefault(order.get("customer_id") or 0, _totals()), 1, revenue, units)
+        if order.get("currency"):
+            aggregate.currencies.add(order["currency"])
+
+def _group_key(group_by: str, day: str, status: str) -> str:
+    if group_by == "status":
+        return status
+    if group_by == "month":
+        return day[:7]
+    if group_by == "week":
+        year, week, _ = datetime.strptime(day, "%Y-%m-%d").isocalendar()
+        return f"{year}-W{week:02d}"
+    return day
+
+def _round(value: Decimal) -> float:
+    return float(value.quantize(CENT))
+
+class OrderAnalytics:
+    """Grouped order aggregates computed server-side from streamed order pages
+
+    Orders are aggregated per UTC day while pages stream in, so memory holds
+    one page per fetch plus the compact day aggregates, never the orders.
+    Aggregates of closed days are kept (LRU, `cache_days` days, `ttl`
+    seconds) and reused by later summaries over overlapping ranges; only the
+    days not cached, and today, are fetched. Order changes seen by sync or
+    webhooks drop the aggregate of the day the order was created.
+    """
+
+    def __init__(self, ttl: float = ANALYTICS_CACHE_TTL, cache_days: int = ANALYTICS_CACHE_DAYS,
+                 page_size: int = ANALYTICS_PAGE_SIZE, concurrency: int = PAGINATION_CONCURRENCY):
+        self.ttl = ttl
+        self.cache_days = cache_days
+        self.page_size = page_size
+        self.concurrency = concurrency
+        # day -> (expires_at, aggregate); ordered from least to most recently used
+        self._days: "OrderedDict[str, Tuple[float, DayAggregate]]" = OrderedDict()
+        # Days invalidated while a fetch covering them was running must not be cached by it
+        self._fetching: Dict[int, Set[str]] = {}
+        self.days_hit = 0
+        self.days_fetched = 0
+        self.orders_streamed = 0
+        self.invalidations = 0
+
+    def _get(self, day: str) -> Optional[DayAggregate]:
+        entry = self._days.get(day)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._days[day]
+            return None
+        self._days.move_to_end(day)
+        return entry[1]
+
+    def _put(self, day: str, aggregate: DayAggregate):
+        if self.ttl <= 0 or self.cache_days <= 0:
+            return
+        self._days[day] = (time.monotonic() + self.ttl, aggregate)
+        self._days.move_to_end(day)
+        while len(self._days) > self.cache_days:
+            self._days.popitem(last=False)
+
+    def invalidate(self, order: Dict[str, Any]):
+        """Drop the cached aggregate of the day a changed order was created on"""
+        created = _created(order)
+        if created is None:
+            return
+        day = created.date().isoformat()
+        if self._days.pop(day, None) is not None:
+            self.invalidations += 1
+        for invalidated in self._fetching.values():
+            invalidated.add(day)
+
+    def clear(self):
+        self._days.clear()
+
+    async def _fetch(self, start: datetime, end: datetime, segments: List[Tuple[str, bool]]) -> List[Tuple[str, DayAggregate]]:
+        """Stream the orders created in [start, end) into per-day aggregates, caching the closed full days"""
+        invalidated: Set[str] = set()
+        self._fetching[id(invalidated)] = invalidated
+        try:
+            days: Dict[str, DayAggregate] = {day: DayAggregate() for day, _ in segments}
+            params = {
+                # `after` is exclusive on some WooCommerce versions; the exact range is applied below
+                "after": (start - timedelta(seconds=1)).isoformat(timespec="seconds"),
+                "before": end.isoformat(timespec="seconds"),
+                "dates_are_gmt": "true",
+                "status": "any",
+                "orderby": "date",
+                "order": "asc",
+                "_fields": ORDER_FIELDS,
+            }
+            async for page in iter_pages("orders", params, per_page=self.page_size):
+                for order in page.items:
+                    created = _created(order)
+                    if created is None or not start <= created < end:
+                        continue
+                    days[created.date().isoformat()].add(order)
+                    self.orders_streamed += 1
+        finally:
+            del self._fetching[id(invalidated)]
+        for day, cacheable in segments:
+            if cacheable and day not in invalidated:
+                self._put(day, days[day])
+        return list(days.items())
+
+    async def summarize(self, date_from: str, date_to: str, group_by: str = "status",
+                        statuses: Optional[List[str]] = None, top_products: int = 10, limit: int = 50) -> OrdersSummary:
+        if group_by not in GROUP_BY:
+            raise ValueError(f"group_by must be one of {', '.join(GROUP_BY)}")
+        started = time.perf_counter()
+        start, end = _parse_bound(date_from, end=False), _parse_bound(date_to, end=True)
+        if end <= start:
+            raise ValueError("date_to must be after date_from")
+
+        # Split the range into UTC days: cached closed days are reused, the rest is fetched
+        now = _utcnow()
+        days: List[Tuple[str, DayAggregate]] = []
+        # (segment start, segment end, day, cacheable) of each day to fetch
+        missing: List[Tuple[datetime, datetime, str, bool]] = []
+        cursor = start
+        while cursor < end:
+            day_start = datetime(cursor.year, cursor.month, cursor.day)
+            day_end = day_start + DAY
+            segment_end = min(day_end, end)
+            day = day_start.date().isoformat()
+            # A day cut by the range bounds is fetched for just that part and never cached
+            cacheable = cursor == day_start and segment_end == day_end and day_end + CLOSE_DELAY <= now
+            aggregate = self._get(day) if cacheable else None
+            if aggregate is not None:
+                days.append((day, aggregate))
+            else:
+                missing.append((cursor, segment_end, day, cacheable))
+            cursor = segment_end
+        self.days_hit += len(days)
+        self.days_fetched += len(missing)
+
+        # Contiguous missing days are fetched as ranges of up to FETCH_CHUNK_DAYS days
+        chunks: List[List[Tuple[datetime, datetime, str, bool]]] = []
+        for segment in missing:
+            if chunks and chunks[-1][-1][1] == segment[0] and len(chunks[-1]) < FETCH_CHUNK_DAYS:
+                chunks[-1].append(segment)
+            else:
+                chunks.append([segment])
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+
+        async def fetch(chunk: List[Tuple[datetime, datetime, str, bool]]) -> List[Tuple[str, DayAggregate]]:
+            async with semaphore:
+                return await self._fetch(chunk[0][0], chunk[-1][1], [(day, cacheable) for _, _, day, cacheable in chunk])
+
+        for fetched in await asyncio.gather(*(fetch(chunk) for chunk in chunks)):
+            days.extend(fetched)
+
+        wanted = set(statuses) if statuses else None
+        overall = _totals()
+        groups: Dict[str, Totals] = {}
+        products: Dict[int, Totals] = {}
+        names: Dict[int, str] = {}
+        currencies: Set[str] = set()
+        for day, aggregate in days:
+            names.update(aggregate.names)
+            for status, status_aggregate in aggregate.statuses.items():
+                if wanted is not None and status not in wanted:
+                    continue
+                currencies |= status_aggregate.currencies
+                _add(overall, *status_aggregate.totals)
+                for product_id, totals in status_aggregate.products.items():
+                    _add(products.setdefault(product_id, _totals()), *totals)
+                if group_by == "customer":
+                    for customer_id, totals in status_aggregate.customers.items():
+                        _add(groups.setdefault(str(customer_id), _totals()), *totals)
+                elif group_by != "product":
+                    _add(groups.setdefault(_group_key(group_by, day, status), _totals()), *status_aggregate.totals)
+
+        by_revenue = sorted(products.items(), key=lambda item: (-item[1][1], item[0]))
+        if group_by == "product":
+            ordered = [(str(product_id), totals, names.get(product_id)) for product_id, totals in by_revenue]
+        elif group_by in ("status", "customer"):
+            ordered = [(key, totals, None) for key, totals in sorted(groups.items(), key=lambda item: (-item[1][1], item[0]))]
+        else:
+            ordered = [(key, totals, None) for key, totals in sorted(groups.items())]
+
+        summary = OrdersSummary(
+            date_from=start.isoformat(timespec="seconds"),
+            date_to=end.isoformat(timespec="seconds"),
+            group_by=group_by,
+            statuses=statuses,
+            orders=overall[0],
+            revenue=_round(overall[1]),
+            units=overall[2],
+            currencies=sorted(currencies),
+            groups=[SummaryGroup(key=key, name=name, orders=totals[0], revenue=_round(totals[1]), units=totals[2],
+                                 average_order_value=_round(totals[1] / totals[0]) if totals[0] else 0.0)
+                    for key, totals, name in ordered[:max(0, limit)]],
+            total_groups=len(ordered),
+            top_products=[ProductSales(product_id=product_id, name=names.get(product_id), orders=totals[0],
+                                       units=totals[2], revenue=_round(totals[1]))
+                          for product_id, totals in by_revenue[:max(0, top_products)]],
+            days_cached=len(days) - len(missing),
+            days_fetched=len(missing),
+            seconds=round(time.perf_counter() - started, 3),
+        )
+        logger.info("Summarized %d orders by %s: %d days cached, %d fetched (%.3fs)",
+                    summary.orders, group_by, summary.days_cached, summary.days_fetched, summary.seconds)
+        return summary
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached_days": len(self._days),
+            "days_hit": self.days_hit,
+            "days_fetched": self.days_fetched,
+            "orders_streamed": self.orders_streamed,
+            "invalidations": self.invalidations,
+        }
+
+order_analytics = OrderAnalytics()
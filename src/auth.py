@@ -0,0 +1,66 @@
+import hmac
+from typing import Dict, Iterable, Optional
+from starlette.types import ASGIApp, Receive, Scope, Send
+from .config import API_KEYS, hash_api_key
+from .tracing import span
+
+MISSING_KEY = b'{"error": {"code": -32000, "message": "Missing API key"}}'
+INVALID_KEY = b'{"error": {"code": -32000, "message": "Invalid API key"}}'
+
+def identify(provided: str, keys: Dict[str, str]) -> Optional[str]:
+    """Identity of the key matching `provided`, comparing its digest with every configured digest in constant time"""
+    digest = hash_api_key(provided).encode()
+    identity = None
+    for known, name in keys.items():
+        if hmac.compare_digest(digest, known.encode()):
+            identity = name
+    return identity
+
+class ApiKeyAuth:
+    """Pure ASGI API-key check in front of the app
+
+    Accepts `Authorization: Bearer <key>` or the bare key. The key's identity
+    is stored in `scope["state"]["api_key_id"]` (`request.state.api_key_id`)
+    for downstream rate limits and metrics. Responses, including streamed
+    ones, pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, keys: Optional[Dict[str, str]] = None, exempt_paths: Iterable[str] = ()):
+        self.app = app
+        self.keys = API_KEYS if keys is None else keys
+        self.exempt_paths = frozenset(exempt_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.keys or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        header = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                header = value.decode("latin-1")
+                break
+        if not header:
+            await self._reject(send, MISSING_KEY)
+            return
+
+        provided = header[7:] if header.startswith("Bearer ") else header
+        with span("auth") as current:
+            identity = identify(provided, self.keys)
+            if current is not None:
+                current.set(client=identity or "")
+        if identity is None:
+            await self._reject(send, INVALID_KEY)
+            return
+
+        scope.setdefault("state", {})["api_key_id"] = identity
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _reject(send: Send, body: bytes):
+        await send({
+            "type": "http.response.start",
+            "status": 401,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
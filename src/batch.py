@@ -0,0 +1,193 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from . import jsonutil
+from .config import MCP_BATCH_CONCURRENCY, MCP_BATCH_MAX_SIZE
+from .sessions import buffer_body
+from .tracing import span
+
+# Sub-request statuses that concern the whole POST (session, Host, Accept, Content-Type), not one message
+BATCH_WIDE_STATUSES = (404, 421, 406, 415)
+
+def _rpc_error(id: Any, code: int, message: str) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": id, "error": {"code": code, "message": message}}
+
+def _event(data: bytes) -> bytes:
+    return b"event: message\r\ndata: " + data + b"\r\n\r\n"
+
+def _sse_data(buffer: bytes) -> Tuple[List[bytes], bytes]:
+    """`data` of each complete SSE event in `buffer`, and the incomplete rest"""
+    events = []
+    normalized = buffer.replace(b"\r\n", b"\n")
+    *complete, rest = normalized.split(b"\n\n")
+    for block in complete:
+        lines = [line[5:].removeprefix(b" ") for line in block.split(b"\n") if line.startswith(b"data:")]
+        # Priming events carry an id and no data
+        if lines and any(lines):
+            events.append(b"\n".join(lines))
+    return events, rest
+
+class BatchRequests:
+    """JSON-RPC batch arrays on the MCP endpoint, for clients that fan out many tool calls
+
+    The SDK transport takes one message per POST. Here a POST whose body is
+    an array is split, and each request in it goes to the MCP app as its own
+    sub-request with the same headers and scope state, so auth and the
+    shared session check run once per batch. At most `concurrency` run at a
+    time. The reply is one SSE stream carrying each response (and any
+    progress notification) as soon as it is ready, in completion order.
+    Notifications in the batch are delivered first and get no reply.
+    """
+
+    def __init__(self, app: ASGIApp, path: str = "/mcp", concurrency: int = MCP_BATCH_CONCURRENCY,
+                 max_size: int = MCP_BATCH_MAX_SIZE):
+        self.app = app
+        self.path = path.rstrip("/")
+        self.concurrency = concurrency
+        self.max_size = max_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"].rstrip("/") != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        body, receive = await buffer_body(receive)
+        if not body.lstrip().startswith(b"["):
+            await self.app(scope, receive, send)
+            return
+        try:
+            messages = jsonutil.loads(body)
+        except ValueError:
+            # Let the SDK answer with its usual parse error
+            await self.app(scope, receive, send)
+            return
+
+        if not messages:
+            await self._json(send, 400, _rpc_error(None, -32600, "Invalid Request: empty batch"))
+            return
+        if len(messages) > self.max_size:
+            await self._json(send, 400, _rpc_error(None, -32600, f"Invalid Request: batch larger than {self.max_size} messages"))
+            return
+
+        with span("mcp.batch", size=len(messages)):
+            await self._handle(scope, messages, send)
+
+    async def _handle(self, scope: Scope, messages: List[Any], send: Send):
+        requests, notifications, replies = [], [], []
+        for message in messages:
+            if not isinstance(message, dict) or message.get("jsonrpc") != "2.0" or not isinstance(message.get("method"), str):
+                replies.append(_rpc_error(message.get("id") if isinstance(message, dict) else None, -32600, "Invalid Request"))
+            elif message["method"] == "initialize":
+                replies.append(_rpc_error(message.get("id"), -32600, "Invalid Request: initialize cannot be batched"))
+            elif "id" in message:
+                requests.append(message)
+            else:
+                notifications.append(message)
+
+        for notification in notifications:
+            await self._dispatch(scope, notification, None, None)
+
+        if not requests and not replies:
+            await send({"type": "http.response.start", "status": 202, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        out: asyncio.Queue = asyncio.Queue()
+        first: asyncio.Future = asyncio.get_running_loop().create_future()
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def run(message: Dict[str, Any]):
+            async with limit:
+                try:
+                    await self._dispatch(scope, message, out, first)
+                except Exception as e:
+                    out.put_nowait(jsonutil.dumps(_rpc_error(message["id"], -32603, f"Internal error: {e}")).encode())
+
+        tasks = [asyncio.create_task(run(message)) for message in requests]
+        finished = asyncio.gather(*tasks)
+        try:
+            headers = [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache, no-transform")]
+            if tasks:
+                # The first sub-request tells whether the session and headers are acceptable at all
+                await asyncio.wait([first, finished], return_when=asyncio.FIRST_COMPLETED)
+                if first.done():
+                    status, start_headers, error_body = first.result()
+                    if status in BATCH_WIDE_STATUSES:
+                        await send({"type": "http.response.start", "status": status, "headers": start_headers})
+                        await send({"type": "http.response.body", "body": error_body})
+                        return
+                    headers += [(name, value) for name, value in start_headers if name == b"mcp-session-id"]
+
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            for reply in replies:
+                await send({"type": "http.response.body", "body": _event(jsonutil.dumps(reply).encode()), "more_body": True})
+            while True:
+                getter = asyncio.ensure_future(out.get())
+                await asyncio.wait([getter, finished], return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    # Everything finished; drain what is left
+                    while not out.empty():
+                        await send({"type": "http.response.body", "body": _event(out.get_nowait()), "more_body": True})
+                    break
+                await send({"type": "http.response.body", "body": _event(getter.result()), "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _dispatch(self, scope: Scope, message: Dict[str, Any], out: Optional[asyncio.Queue],
+                        first: Optional[asyncio.Future]):
+        """Send one message through the MCP app, putting each JSON-RPC message of its reply on `out`"""
+        body = jsonutil.dumps(message).encode()
+        headers = [(name, value) for name, value in scope["headers"] if name != b"content-length"]
+        sub_scope = {**scope, "headers": headers + [(b"content-length", str(len(body)).encode())]}
+        delivered = False
+        status = 0
+        start_headers: List[Tuple[bytes, bytes]] = []
+        streaming = False
+        buffer = b""
+
+        async def sub_receive() -> Message:
+            nonlocal delivered
+            if not delivered:
+                delivered = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # The SSE response waits for a disconnect that only comes when it is cancelled
+            await asyncio.Event().wait()
+
+        async def sub_send(reply: Message):
+            nonlocal status, start_headers, streaming, buffer
+            if reply["type"] == "http.response.start":
+                status, start_headers = reply["status"], list(reply.get("headers", []))
+                streaming = status == 200 and any(name == b"content-type" and value.startswith(b"text/event-stream")
+                                                  for name, value in start_headers)
+                if status == 200 and first is not None and not first.done():
+                    first.set_result((status, start_headers, b""))
+                return
+            buffer += reply.get("body", b"")
+            if streaming and out is not None:
+                events, buffer = _sse_data(buffer)
+                for data in events:
+                    out.put_nowait(data)
+
+        await self.app(sub_scope, sub_receive, sub_send)
+        if out is None or streaming or status == 202:
+            return
+        if status == 200:
+            out.put_nowait(buffer)
+            return
+        if first is not None and not first.done():
+            first.set_result((status, start_headers, buffer))
+        try:
+            error = jsonutil.loads(buffer)["error"]
+        except (ValueError, KeyError, TypeError):
+            error = {"code": -32603, "message": f"HTTP {status}"}
+        out.put_nowait(jsonutil.dumps({"jsonrpc": "2.0", "id": message["id"], "error": error}).encode())
+
+    @staticmethod
+    async def _json(send: Send, status: int, payload: Dict[str, Any]):
+        body = jsonutil.dumps(payload).encode()
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
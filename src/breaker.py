@@ -0,0 +1,100 @@
+import time
+from typing import Any, Dict
+from .config import WOO_BREAKER_FAILURES, WOO_BREAKER_SLOW_CALL, WOO_BREAKER_OPEN_SECONDS, logger
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the store while the circuit is open"""
+
+    def __init__(self, retry_in: float):
+        self.retry_in = retry_in
+        super().__init__(f"WooCommerce store unavailable (circuit open, retrying in {retry_in:.0f}s)")
+
+class CircuitBreaker:
+    """Stop calling the store after consecutive failures or slow responses
+
+    While open every request fails fast with CircuitOpenError. Once
+    `open_seconds` have passed a single probe request is let through: success
+    closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = WOO_BREAKER_FAILURES, slow_call: float = WOO_BREAKER_SLOW_CALL,
+                 open_seconds: float = WOO_BREAKER_OPEN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.slow_call = slow_call
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.times_opened = 0
+        self.rejected = 0
+        self.slow_calls = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.failure_threshold > 0
+
+    def retry_in(self) -> float:
+        """Seconds until a probe may be sent; 0 when requests are allowed"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def allow(self) -> bool:
+        """Admit one request or raise CircuitOpenError; returns True when it is the half-open probe"""
+        if not self.enabled:
+            return False
+        if self.state == OPEN:
+            if self.retry_in() > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.retry_in())
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self._probing:
+                self.rejected += 1
+                raise CircuitOpenError(0.0)
+            self._probing = True
+            return True
+        return False
+
+    def end_probe(self):
+        """Free the probe slot, also when the probe was cancelled before recording an outcome"""
+        self._probing = False
+
+    def record(self, ok: bool, elapsed: float = 0.0):
+        """Record the outcome of an admitted request; responses slower than `slow_call` count as failures"""
+        if not self.enabled or self.state == OPEN:
+            return
+        if ok and self.slow_call > 0 and elapsed > self.slow_call:
+            self.slow_calls += 1
+            ok = False
+        if ok:
+            if self.state == HALF_OPEN:
+                logger.info("WooCommerce store recovered, circuit closed")
+            self.state = CLOSED
+            self.failures = 0
+            return
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self.times_opened += 1
+        logger.warning("Circuit opened after %d consecutive upstream failures, failing fast for %.0fs",
+                       self.failures, self.open_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "retry_in_seconds": round(self.retry_in(), 1),
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "slow_calls": self.slow_calls,
+        }
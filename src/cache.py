@@ -0,0 +1,195 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from . import jsonutil
+from .config import CACHE_ENABLED, CACHE_MAX_BYTES, CACHE_DEFAULT_TTL, CACHE_TTLS, CACHE_STALE_TTL, logger
+
+def resource_of(endpoint: str) -> str:
+    """Top-level WooCommerce resource of an endpoint, e.g. 'orders/12' -> 'orders'"""
+    return endpoint.strip("/").split("?", 1)[0].split("/", 1)[0]
+
+def make_key(endpoint: str, params: Optional[Dict] = None) -> str:
+    """Cache key from endpoint plus params normalized by sorted keys and string values"""
+    endpoint = endpoint.strip("/")
+    if not params:
+        return endpoint
+    normalized = sorted((str(k), str(v)) for k, v in params.items() if v is not None)
+    return f"{endpoint}?{json.dumps(normalized, separators=(',', ':'))}"
+
+def estimate_size(value: Any) -> int:
+    """Payload size for values that did not come straight from a response body"""
+    return len(jsonutil.dumps(value))
+
+class ResponseCache:
+    """TTL + LRU cache for read-only WooCommerce responses, bounded by payload bytes
+
+    Expired entries are kept for another `stale_ttl` seconds so they can be
+    served as a last known good response while the store is unavailable.
+
+    Each resource has a generation that `invalidate` bumps. A read started
+    before a write passes the generation it saw to `set`, which then drops
+    the (pre-write) response instead of caching it.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, default_ttl: float = CACHE_DEFAULT_TTL,
+                 ttls: Optional[Dict[str, float]] = None, enabled: bool = CACHE_ENABLED,
+                 stale_ttl: float = CACHE_STALE_TTL):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.ttls = dict(CACHE_TTLS if ttls is None else ttls)
+        self.enabled = enabled
+        self.stale_ttl = stale_ttl
+        # key -> (expires_at, size, value, stored_at); ordered from least to most recently used
+        self._entries: "OrderedDict[str, Tuple[float, int, Any, float]]" = OrderedDict()
+        self._bytes = 0
+        self._generations: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_served = 0
+        self.discarded = 0
+
+    def generation(self, endpoint: str) -> int:
+        """Generation of the endpoint's resource; changes whenever its cached entries are invalidated"""
+        return self._generations.get(resource_of(endpoint), 0)
+
+    def ttl_for(self, endpoint: str) -> float:
+        """TTL for an endpoint; single items use '<resource>/*' when configured"""
+        path = endpoint.strip("/").split("?", 1)[0]
+        resource = resource_of(path)
+        if path != resource and f"{resource}/*" in self.ttls:
+            return self.ttls[f"{resource}/*"]
+        return self.ttls.get(resource, self.default_ttl)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a fresh cached value or None, counting the hit or miss"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, _, value, _ = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            if expires_at + self.stale_ttl <= now:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key: str) -> Optional[Any]:
+        """Return a fresh cached value or None without counting a hit or miss or touching the LRU order"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[2]
+
+    def get_stale(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Return (value, age in seconds) for an entry still inside its stale window, expired or not"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, _, value, stored_at = entry
+        now = time.monotonic()
+        if expires_at + self.stale_ttl <= now:
+            self._remove(key)
+            return None
+        self.stale_served += 1
+        return value, now - stored_at
+
+    def set(self, key: str, value: Any, size: int, ttl: Optional[float] = None, generation: Optional[int] = None):
+        """Store a value with its payload size, evicting least recently used entries past the byte budget
+
+        With `generation`, the value is dropped if the resource was invalidated since that generation was read.
+        """
+        ttl = self.ttl_for(key) if ttl is None else ttl
+        if not self.enabled or ttl <= 0 or size > self.max_bytes:
+            return
+        if generation is not None and generation != self.generation(key):
+            self.discarded += 1
+            return
+        if key in self._entries:
+            self._remove(key)
+        now = time.monotonic()
+        self._entries[key] = (now + ttl, size, value, now)
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, endpoint: str) -> int:
+        """Drop the entry for an endpoint and every cached listing of its resource"""
+        endpoint = endpoint.strip("/")
+        resource = resource_of(endpoint)
+        self._generations[resource] = self._generations.get(resource, 0) + 1
+        stale = [
+            key for key in self._entries
+            if key == endpoint or key.startswith(f"{endpoint}?")
+            or key == resource or key.startswith(f"{resource}?")
+        ]
+        for key in stale:
+            self._remove(key)
+        if stale:
+            logger.debug("Invalidated %d cached entries for %s", len(stale), endpoint)
+        return len(stale)
+
+    def export_entries(self, resources: Sequence[str], limit: int) -> List[Tuple[str, float, float, int, Any]]:
+        """(key, seconds until expiry, age, size, value) of the `limit` most recently used entries of `resources`"""
+        now = time.monotonic()
+        entries = []
+        for key in reversed(self._entries):
+            if len(entries) >= limit:
+                break
+            expires_at, size, value, stored_at = self._entries[key]
+            if resource_of(key) in resources and expires_at + self.stale_ttl > now:
+                entries.append((key, expires_at - now, now - stored_at, size, value))
+        return entries
+
+    def restore(self, entries: Iterable[Sequence[Any]], elapsed: float) -> int:
+        """Load `export_entries` output written `elapsed` seconds ago, keeping each entry's original expiry
+
+        Entries already past their stale window are skipped, so a restored
+        value is never served longer than it would have been without a restart.
+        """
+        if not self.enabled:
+            return 0
+        now = time.monotonic()
+        restored = 0
+        # Least recently used first, so the LRU order survives
+        for key, expires_in, age, size, value in reversed(list(entries)):
+            expires_at = now + expires_in - elapsed
+            if expires_at + self.stale_ttl <= now or size > self.max_bytes or self._bytes + size > self.max_bytes:
+                continue
+            if key in self._entries:
+                continue
+            self._entries[key] = (expires_at, size, value, now - age - elapsed)
+            self._bytes += size
+            restored += 1
+        return restored
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: str):
+        _, size, _, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale_served": self.stale_served,
+            "discarded": self.discarded,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+response_cache = ResponseCache()
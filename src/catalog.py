@@ -0,0 +1,280 @@
+import math
+import re
+import time
+import unicodedata
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from .config import CATALOG_PAGE_SIZE, logger
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Term weights per field: a hit in the product name counts more than one in the description
+NAME_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+SKU_WEIGHT = 5.0
+
+# Only the fields the Product model and the filters need are kept in memory
+STORED_FIELDS = ("id", "name", "price", "regular_price", "sale_price", "stock_status", "categories", "sku", "date_created_gmt")
+SYNC_FIELDS = STORED_FIELDS + ("description", "short_description", "status")
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase, accent-folded alphanumeric tokens with HTML tags removed"""
+    if not text:
+        return []
+    text = _TAG_RE.sub(" ", text)
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").lower()
+    return _TOKEN_RE.findall(text)
+
+class CatalogIndex:
+    """In-memory product mirror with a ranked full-text index, SKU lookup and category/stock filters"""
+
+    def __init__(self):
+        self.clear()
+        self.ready = False
+        self.loaded_at: Optional[float] = None
+        # Changes applied while a full load runs, replayed on top of the loaded catalog
+        self._pending: Optional[List[Tuple[str, Any]]] = None
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def upsert(self, product: Dict):
+        """Insert or replace one product from its WooCommerce representation"""
+        if self._pending is not None:
+            self._pending.append(("upsert", product))
+        product_id = product["id"]
+        self._discard(product_id)
+        # Drafts, trashed and private products are not visible through the public listing
+        if product.get("status", "publish") != "publish":
+            return
+
+        stored = {field: product.get(field) for field in STORED_FIELDS}
+        stored["categories"] = stored["categories"] or []
+
+        terms: Dict[str, float] = {}
+        for token in tokenize(product.get("name")):
+            terms[token] = terms.get(token, 0.0) + NAME_WEIGHT
+        description = f"{product.get('short_description') or ''} {product.get('description') or ''}"
+        for token in tokenize(description):
+            terms[token] = terms.get(token, 0.0) + DESCRIPTION_WEIGHT
+        for token in tokenize(product.get("sku")):
+            terms[token] = terms.get(token, 0.0) + SKU_WEIGHT
+        self._index(stored, terms)
+
+    def _index(self, stored: Dict, terms: Dict[str, float]):
+        """Add a stored product and its term weights to the lookup structures"""
+        product_id = stored["id"]
+        self._products[product_id] = stored
+        self._terms[product_id] = terms
+        for token, weight in terms.items():
+            self._postings.setdefault(token, {})[product_id] = weight
+
+        sku = (stored.get("sku") or "").strip()
+        if sku:
+            self._sku[sku.lower()] = product_id
+        for category in stored["categories"]:
+            self._by_category.setdefault(category.get("id"), set()).add(product_id)
+        self._dirty = True
+
+    def remove(self, product_id: int):
+        if self._pending is not None:
+            self._pending.append(("remove", product_id))
+        self._discard(product_id)
+
+    def _discard(self, product_id: int):
+        stored = self._products.pop(product_id, None)
+        if stored is None:
+            return
+        for token in self._terms.pop(product_id, {}):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._postings[token]
+        sku = (stored.get("sku") or "").strip().lower()
+        if sku and self._sku.get(sku) == product_id:
+            del self._sku[sku]
+        for category in stored["categories"]:
+            members = self._by_category.get(category.get("id"))
+            if members is not None:
+                members.discard(product_id)
+        self._dirty = True
+
+    def replace_all(self, products: Iterable[Dict]):
+        """Rebuild the index from a full catalog pull"""
+        self.clear()
+        for product in products:
+            self.upsert(product)
+        self.ready = True
+        self.loaded_at = time.time()
+
+    def begin_load(self):
+        """Start recording upserts and removals so `finish_load` can replay them"""
+        self._pending = []
+
+    def finish_load(self, loaded: "CatalogIndex") -> int:
+        """Take over a freshly loaded index, then replay the changes made since `begin_load`
+
+        The pages of a full pull can predate webhook or sync changes that
+        arrived while it ran; replaying those changes keeps them instead of
+        letting the older pages overwrite them. Returns the number replayed.
+        """
+        pending, self._pending = self._pending or [], None
+        for name in _STATE:
+            setattr(self, name, getattr(loaded, name))
+        self.ready = True
+        self.loaded_at = loaded.loaded_at
+        for action, value in pending:
+            if action == "upsert":
+                self.upsert(value)
+            else:
+                self.remove(value)
+        return len(pending)
+
+    def abort_load(self):
+        self._pending = None
+
+    def export_state(self) -> List[Tuple[Dict, Dict[str, float]]]:
+        """(stored product, term weights) pairs; `load_state` rebuilds the index from them without re-tokenizing"""
+        return [(stored, self._terms[product_id]) for product_id, stored in self._products.items()]
+
+    def load_state(self, entries: Iterable[Tuple[Dict, Dict[str, float]]], loaded_at: float):
+        """Rebuild the index from `export_state` output, e.g. a startup snapshot"""
+        self.clear()
+        for stored, terms in entries:
+            self._index(stored, terms)
+        self.ready = True
+        self.loaded_at = loaded_at
+
+    def clear(self):
+        self._products: Dict[int, Dict] = {}
+        self._terms: Dict[int, Dict[str, float]] = {}
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._sku: Dict[str, int] = {}
+        self._by_category: Dict[int, Set[int]] = {}
+        self._vocabulary: List[str] = []
+        self._ordered: List[int] = []
+        self._dirty = True
+
+    def get(self, product_id: int) -> Optional[Dict]:
+        return self._products.get(product_id)
+
+    def get_by_sku(self, sku: str) -> Optional[Dict]:
+        product_id = self._sku.get(sku.strip().lower())
+        return self._products.get(product_id) if product_id is not None else None
+
+    def _refresh(self):
+        """Rebuild the sorted vocabulary and the default listing order after changes"""
+        if not self._dirty:
+            return
+        self._vocabulary = sorted(self._postings)
+        # Same default order as the REST API: newest first
+        self._ordered = sorted(
+            self._products,
+            key=lambda pid: (self._products[pid].get("date_created_gmt") or "", pid),
+            reverse=True,
+        )
+        self._dirty = False
+
+    def _expand(self, token: str) -> List[str]:
+        """The token itself plus vocabulary terms it prefixes (for tokens of 3+ chars)"""
+        if len(token) < 3:
+            return [token] if token in self._postings else []
+        start = bisect_left(self._vocabulary, token)
+        matches = []
+        for term in self._vocabulary[start:]:
+            if not term.startswith(token):
+                break
+            matches.append(term)
+        return matches
+
+    def _matches_filters(self, product_id: int, category: Optional[int], stock_status: Optional[str]) -> bool:
+        if category is not None and product_id not in self._by_category.get(category, ()):
+            return False
+        if stock_status is not None and self._products[product_id].get("stock_status") != stock_status:
+            return False
+        return True
+
+    def search(self, query: str, per_page: int = 10, page: int = 1,
+               category: Optional[int] = None, stock_status: Optional[str] = None) -> List[Dict]:
+        """Ranked search: every query token must match a name, description or SKU term"""
+        self._refresh()
+        exact = self._sku.get(query.strip().lower())
+
+        scores: Optional[Dict[int, float]] = None
+        total = len(self._products) or 1
+        for token in tokenize(query):
+            token_scores: Dict[int, float] = {}
+            for term in self._expand(token):
+                postings = self._postings[term]
+                idf = math.log(1 + total / len(postings))
+                # Exact terms outrank prefix expansions of the same token
+                boost = 1.0 if term == token else 0.5
+                for product_id, weight in postings.items():
+                    token_scores[product_id] = max(token_scores.get(product_id, 0.0), boost * idf * weight / (weight + 1.0))
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {pid: score + token_scores[pid] for pid, score in scores.items() if pid in token_scores}
+            if not scores:
+                break
+
+        ranked: List[Tuple[float, int]] = [(-score, pid) for pid, score in (scores or {}).items()]
+        ranked.sort()
+        ids = [pid for _, pid in ranked]
+        if exact is not None:
+            ids = [exact] + [pid for pid in ids if pid != exact]
+
+        ids = [pid for pid in ids if self._matches_filters(pid, category, stock_status)]
+        start = (page - 1) * per_page
+        return [self._products[pid] for pid in ids[start:start + per_page]]
+
+    def list(self, per_page: int = 20, page: int = 1,
+             category: Optional[int] = None, stock_status: Optional[str] = None) -> List[Dict]:
+        """Page through products newest first, optionally filtered"""
+        self._refresh()
+        ids = self._ordered
+        if category is not None or stock_status is not None:
+            ids = [pid for pid in ids if self._matches_filters(pid, category, stock_status)]
+        start = (page - 1) * per_page
+        return [self._products[pid] for pid in ids[start:start + per_page]]
+
+# Lookup structures handed over by `finish_load`
+_STATE = ("_products", "_terms", "_postings", "_sku", "_by_category", "_vocabulary", "_ordered", "_dirty")
+
+catalog = CatalogIndex()
+
+async def load_catalog(index: CatalogIndex = catalog, page_size: int = CATALOG_PAGE_SIZE) -> int:
+    """Pull the full published catalog from WooCommerce into the index
+
+    The pull is built in a separate index and swapped in when complete, so
+    the current index (empty, or restored from a snapshot) keeps serving and
+    taking sync/webhook changes meanwhile; those changes are replayed after
+    the swap.
+    """
+    from .woo_client import fetch_all_pages
+
+    started = time.perf_counter()
+    index.begin_load()
+    try:
+        products = await fetch_all_pages(
+            "products",
+            params={"status": "publish", "_fields": ",".join(SYNC_FIELDS)},
+            per_page=page_size,
+        )
+        loaded = CatalogIndex()
+        loaded.replace_all(products)
+    except BaseException:
+        index.abort_load()
+        raise
+    replayed = index.finish_load(loaded)
+    logger.info("Catalog index loaded: %d products in %.1fs, %d changes replayed", len(index), time.perf_counter() - started, replayed)
+    return len(index)
+
+async def warm_catalog(index: CatalogIndex = catalog):
+    """Background startup load; failures leave product tools on the live API"""
+    try:
+        await load_catalog(index)
+    except Exception as e:
+        logger.error("Catalog index load failed, product tools will use the live API: %s", e)
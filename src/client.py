@@ -0,0 +1,293 @@
+import asyncio
+import itertools
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
+import httpx
+from pydantic import TypeAdapter
+from . import jsonutil
+from .models import Order, OrderBatchItem, OrderInput, OrdersLookup, OrdersSummary, Product
+
+# Client side only: importing this module does not load the server configuration
+PROTOCOL_VERSION = "2025-03-26"
+
+PRODUCT_LIST = TypeAdapter(List[Product])
+ORDER_LIST = TypeAdapter(List[Order])
+BATCH_ITEMS = TypeAdapter(List[OrderBatchItem])
+
+ProgressCallback = Callable[[Dict[str, Any]], Union[None, Awaitable[None]]]
+
+class MCPError(Exception):
+    """JSON-RPC error returned by the server"""
+
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(f"{message} ({code})")
+        self.code = code
+        self.message = message
+        self.data = data
+
+class ToolError(MCPError):
+    """Tool call that ran and failed (`isError` result)"""
+
+    def __init__(self, name: str, message: str):
+        super().__init__(-32000, f"{name}: {message}")
+        self.tool = name
+
+class _SessionExpired(Exception):
+    pass
+
+class _Session:
+    """One initialized MCP session of the pool"""
+
+    def __init__(self):
+        self.id: Optional[str] = None
+        self.protocol_version = PROTOCOL_VERSION
+        self.ready = False
+        self.in_flight = 0
+        self.lock = asyncio.Lock()
+
+class WooMCPClient:
+    """Async client for this server's `/mcp` endpoint
+
+    Keeps a pool of `sessions` initialized MCP sessions over one keep-alive
+    HTTP connection pool. Calls go to the least busy session, up to
+    `max_in_flight` concurrent calls each, and a session the server no
+    longer knows (expired, or the server restarted) is initialized again and
+    the call retried once. Responses are parsed as an SSE stream as they
+    arrive, so progress notifications reach `progress` callbacks while the
+    call runs. `batch()` sends many calls in one JSON-RPC batch POST.
+
+        async with WooMCPClient("http://localhost:8000/mcp", api_key="...") as client:
+            products = await client.search_products("pulsera")
+    """
+
+    def __init__(self, url: str, api_key: Optional[str] = None, sessions: int = 4, max_in_flight: int = 16,
+                 timeout: float = 60.0, http: Optional[httpx.AsyncClient] = None, client_name: str = "woocommerce-mcp-client"):
+        self.url = url
+        self.max_in_flight = max_in_flight
+        self.client_name = client_name
+        self._headers = {"Content-Type": "application/json", "Accept": "application/json, text/event-stream"}
+        if api_key:
+            self._headers["Authorization"] = f"Bearer {api_key}"
+        self._owns_http = http is None
+        self._http = http or httpx.AsyncClient(
+            timeout=timeout, limits=httpx.Limits(max_connections=sessions * max_in_flight, max_keepalive_connections=sessions * max_in_flight))
+        self._sessions = [_Session() for _ in range(sessions)]
+        self._ids = itertools.count(1)
+        self._available = asyncio.Condition()
+
+    async def __aenter__(self) -> "WooMCPClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """End the server-side sessions and close the connection pool"""
+        for session in self._sessions:
+            if session.ready and session.id:
+                try:
+                    await self._http.delete(self.url, headers=self._session_headers(session))
+                except httpx.HTTPError:
+                    pass
+            session.ready = False
+        if self._owns_http:
+            await self._http.aclose()
+
+    def _session_headers(self, session: _Session) -> Dict[str, str]:
+        headers = {**self._headers, "MCP-Protocol-Version": session.protocol_version}
+        if session.id:
+            headers["Mcp-Session-Id"] = session.id
+        return headers
+
+    async def _initialize(self, session: _Session, expired_id: Optional[str] = None):
+        """Initialize `session` unless another call already did (or already replaced `expired_id`)"""
+        async with session.lock:
+            if session.ready and session.id != expired_id:
+                return
+            session.ready = False
+            session.id = None
+            response = await self._http.post(self.url, headers=self._headers, content=jsonutil.dumps({
+                "jsonrpc": "2.0", "id": next(self._ids), "method": "initialize",
+                "params": {"protocolVersion": PROTOCOL_VERSION, "capabilities": {},
+                           "clientInfo": {"name": self.client_name, "version": "1.0"}},
+            }))
+            if response.status_code != 200:
+                raise MCPError(-32000, f"initialize failed with HTTP {response.status_code}: {response.text[:200]}")
+            message = self._last_message(response.text, response.headers.get("content-type", ""))
+            if "error" in message:
+                raise MCPError(**message["error"])
+            session.id = response.headers.get("mcp-session-id")
+            session.protocol_version = message["result"].get("protocolVersion", PROTOCOL_VERSION)
+            await self._http.post(self.url, headers=self._session_headers(session),
+                                  content=jsonutil.dumps({"jsonrpc": "2.0", "method": "notifications/initialized"}))
+            session.ready = True
+
+    @staticmethod
+    def _last_message(text: str, content_type: str) -> Dict[str, Any]:
+        if content_type.startswith("application/json"):
+            return jsonutil.loads(text)
+        data = [line[5:].strip() for line in text.splitlines() if line.startswith("data:") and line[5:].strip()]
+        return jsonutil.loads(data[-1])
+
+    async def _acquire(self) -> _Session:
+        """Least busy session with room for another call, waiting if all are full"""
+        async with self._available:
+            while True:
+                session = min(self._sessions, key=lambda s: (s.in_flight, not s.ready))
+                if session.in_flight < self.max_in_flight:
+                    session.in_flight += 1
+                    return session
+                await self._available.wait()
+
+    async def _release(self, session: _Session):
+        async with self._available:
+            session.in_flight -= 1
+            self._available.notify()
+
+    async def _post(self, session: _Session, payload: Any, wanted: Sequence[Any],
+                    progress: Optional[ProgressCallback]) -> Dict[Any, Dict[str, Any]]:
+        """POST one message or a batch and read the reply stream until every id in `wanted` has answered"""
+        replies: Dict[Any, Dict[str, Any]] = {}
+        async with self._http.stream("POST", self.url, headers=self._session_headers(session),
+                                     content=jsonutil.dumps(payload)) as response:
+            if response.status_code == 404:
+                raise _SessionExpired()
+            if response.status_code != 200:
+                body = (await response.aread()).decode(errors="replace")
+                raise MCPError(-32000, f"HTTP {response.status_code}: {body[:200]}")
+            if response.headers.get("content-type", "").startswith("application/json"):
+                messages = jsonutil.loads(await response.aread())
+                for message in messages if isinstance(messages, list) else [messages]:
+                    replies[message.get("id")] = message
+                return replies
+
+            data: List[str] = []
+            async for line in response.aiter_lines():
+                if line.startswith("data:"):
+                    data.append(line[5:].lstrip())
+                    continue
+                if line or not data:
+                    continue
+                message = jsonutil.loads("\n".join(data))
+                data = []
+                if "id" in message and ("result" in message or "error" in message):
+                    replies[message["id"]] = message
+                    if all(request_id in replies for request_id in wanted):
+                        break
+                elif message.get("method") == "notifications/progress" and progress is not None:
+                    outcome = progress(message.get("params", {}))
+                    if asyncio.iscoroutine(outcome):
+                        await outcome
+        return replies
+
+    async def _send(self, payload: Any, wanted: Sequence[Any], progress: Optional[ProgressCallback] = None) -> Dict[Any, Dict[str, Any]]:
+        session = await self._acquire()
+        try:
+            for attempt in range(2):
+                if not session.ready:
+                    await self._initialize(session)
+                used_id = session.id
+                try:
+                    return await self._post(session, payload, wanted, progress)
+                except _SessionExpired:
+                    if attempt:
+                        raise MCPError(-32000, "Session not found after re-initializing")
+                    await self._initialize(session, expired_id=used_id)
+        finally:
+            await self._release(session)
+
+    @staticmethod
+    def _unwrap(name: str, message: Optional[Dict[str, Any]]) -> Any:
+        if message is None:
+            raise MCPError(-32603, f"No response to {name}")
+        if "error" in message:
+            error = message["error"]
+            raise MCPError(error.get("code", -32603), error.get("message", ""), error.get("data"))
+        result = message["result"]
+        if result.get("isError"):
+            text = " ".join(block.get("text", "") for block in result.get("content", []) if block.get("type") == "text")
+            raise ToolError(name, text)
+        if result.get("structuredContent") is not None:
+            return result["structuredContent"]
+        # Tools without an output schema: the first text block, decoded if it is JSON
+        texts = [block.get("text", "") for block in result.get("content", []) if block.get("type") == "text"]
+        try:
+            return jsonutil.loads(texts[0]) if texts else None
+        except ValueError:
+            return texts[0]
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None,
+                        progress: Optional[ProgressCallback] = None) -> Any:
+        """Structured result of one tool call; raises ToolError or MCPError on failure"""
+        request_id = next(self._ids)
+        params: Dict[str, Any] = {"name": name, "arguments": arguments or {}}
+        if progress is not None:
+            params["_meta"] = {"progressToken": f"progress-{request_id}"}
+        replies = await self._send({"jsonrpc": "2.0", "id": request_id, "method": "tools/call", "params": params},
+                                   [request_id], progress)
+        return self._unwrap(name, replies.get(request_id))
+
+    async def batch(self, calls: Sequence[Tuple[str, Dict[str, Any]]]) -> List[Any]:
+        """Many tool calls in one POST; results in call order, with the exception in place of a failed call"""
+        ids = [next(self._ids) for _ in calls]
+        payload = [{"jsonrpc": "2.0", "id": request_id, "method": "tools/call", "params": {"name": name, "arguments": arguments}}
+                   for request_id, (name, arguments) in zip(ids, calls)]
+        replies = await self._send(payload, ids)
+        results: List[Any] = []
+        for request_id, (name, _) in zip(ids, calls):
+            try:
+                results.append(self._unwrap(name, replies.get(request_id)))
+            except MCPError as e:
+                results.append(e)
+        return results
+
+    # Typed wrappers for this server's tools
+
+    async def list_products(self, per_page: Optional[int] = None, page: int = 1, **options: Any) -> List[Product]:
+        arguments: Dict[str, Any] = {"page": page, **options}
+        if per_page:
+            arguments["per_page"] = per_page
+        result = await self.call_tool("list_products", arguments)
+        return PRODUCT_LIST.validate_python(result["result"])
+
+    async def search_products(self, query: str, per_page: int = 10, **options: Any) -> List[Product]:
+        result = await self.call_tool("search_products", {"query": query, "per_page": per_page, **options})
+        return PRODUCT_LIST.validate_python(result["result"])
+
+    async def get_order(self, order_id: int, fields: Optional[List[str]] = None) -> Order:
+        arguments: Dict[str, Any] = {"order_id": order_id}
+        if fields:
+            arguments["fields"] = fields
+        return Order.model_validate(await self.call_tool("get_order", arguments))
+
+    async def get_orders(self, order_ids: List[int], fields: Optional[List[str]] = None) -> OrdersLookup:
+        arguments: Dict[str, Any] = {"order_ids": order_ids}
+        if fields:
+            arguments["fields"] = fields
+        return OrdersLookup.model_validate(await self.call_tool("get_orders", arguments))
+
+    async def list_orders(self, per_page: Optional[int] = None, **options: Any) -> List[Order]:
+        arguments: Dict[str, Any] = dict(options)
+        if per_page:
+            arguments["per_page"] = per_page
+        result = await self.call_tool("list_orders", arguments)
+        return ORDER_LIST.validate_python(result["result"])
+
+    async def create_order(self, customer_id: int, line_items: List[Dict[str, int]], billing: Dict[str, str],
+                           shipping: Optional[Dict[str, str]] = None, fields: Optional[List[str]] = None) -> Order:
+        arguments: Dict[str, Any] = {"customer_id": customer_id, "line_items": line_items, "billing": billing}
+        if shipping:
+            arguments["shipping"] = shipping
+        if fields:
+            arguments["fields"] = fields
+        return Order.model_validate(await self.call_tool("create_order", arguments))
+
+    async def summarize_orders(self, date_from: str, date_to: str, group_by: str = "status",
+                               statuses: Optional[List[str]] = None, **options: Any) -> OrdersSummary:
+        arguments: Dict[str, Any] = {"date_from": date_from, "date_to": date_to, "group_by": group_by, **options}
+        if statuses:
+            arguments["statuses"] = statuses
+        return OrdersSummary.model_validate(await self.call_tool("summarize_orders", arguments))
+
+    async def create_orders_batch(self, orders: List[OrderInput]) -> List[OrderBatchItem]:
+        result = await self.call_tool("create_orders_batch", {"orders": [order.model_dump(exclude_none=True) for order in orders]})
+        return BATCH_ITEMS.validate_python(result["result"])
@@ -1,22 +1,143 @@
+import hashlib
 import os
+import re
 from dotenv import load_dotenv
 import logging
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+from .logs import setup_logging
 
 # Load environment variables
 load_dotenv()
 
+def _parse_floats(value: str) -> dict:
+    """Parse 'products=60,orders=15' into {'products': 60.0, 'orders': 15.0}"""
+    parsed = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, number = item.split("=", 1)
+            parsed[name.strip()] = float(number)
+    return parsed
+
+# Logging: records go through a bounded queue to a writer thread, as JSON lines or plain text.
+# LOG_SAMPLING keeps only a fraction of the records at a level below WARNING, e.g. "debug=0.1"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_SAMPLING = _parse_floats(os.getenv("LOG_SAMPLING", ""))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+setup_logging(LOG_LEVEL, LOG_FORMAT, LOG_SAMPLING, LOG_QUEUE_SIZE)
+logger = logging.getLogger(__name__)
+
 # WooCommerce API configuration
 WOO_URL = os.getenv("WOO_URL", "https://yourstore.com")
 WOO_CONSUMER_KEY = os.getenv("WOO_CONSUMER_KEY")
 WOO_CONSUMER_SECRET = os.getenv("WOO_CONSUMER_SECRET")
 
-# Authentication configuration
+# WooCommerce HTTP client pool and timeouts
+WOO_TIMEOUT = float(os.getenv("WOO_TIMEOUT", "30"))
+WOO_CONNECT_TIMEOUT = float(os.getenv("WOO_CONNECT_TIMEOUT", "10"))
+WOO_POOL_SIZE = int(os.getenv("WOO_POOL_SIZE", "20"))
+WOO_KEEPALIVE_CONNECTIONS = int(os.getenv("WOO_KEEPALIVE_CONNECTIONS", "10"))
+WOO_KEEPALIVE_EXPIRY = float(os.getenv("WOO_KEEPALIVE_EXPIRY", "30"))
+# Upstream rate limiting and retries
+WOO_RATE_LIMIT = float(os.getenv("WOO_RATE_LIMIT", "0"))  # requests/second, 0 = unlimited
+WOO_RATE_BURST = int(os.getenv("WOO_RATE_BURST", "10"))
+WOO_MAX_CONCURRENCY = int(os.getenv("WOO_MAX_CONCURRENCY", str(WOO_POOL_SIZE)))
+WOO_MAX_RETRIES = int(os.getenv("WOO_MAX_RETRIES", "3"))
+WOO_RETRY_BACKOFF = float(os.getenv("WOO_RETRY_BACKOFF", "0.5"))
+WOO_RETRY_MAX_WAIT = float(os.getenv("WOO_RETRY_MAX_WAIT", "30"))
+# Circuit breaker: open after N consecutive failures (0 disables) or responses slower than SLOW_CALL seconds
+WOO_BREAKER_FAILURES = int(os.getenv("WOO_BREAKER_FAILURES", "5"))
+WOO_BREAKER_SLOW_CALL = float(os.getenv("WOO_BREAKER_SLOW_CALL", "10"))
+WOO_BREAKER_OPEN_SECONDS = float(os.getenv("WOO_BREAKER_OPEN_SECONDS", "30"))
+# Pages fetched in parallel when a tool needs every page of a listing
+PAGINATION_CONCURRENCY = int(os.getenv("PAGINATION_CONCURRENCY", "4"))
+# WooCommerce accepts at most 100 items per /batch request
+BATCH_SIZE = min(int(os.getenv("BATCH_SIZE", "100")), 100)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "2"))
+
+# Response cache for read-only GET requests
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_DEFAULT_TTL = float(os.getenv("CACHE_DEFAULT_TTL", "30"))
+CACHE_TTLS = _parse_floats(os.getenv("CACHE_TTLS", "products=120,orders=15,orders/*=30"))
+# How long past its TTL a response may still be served while the store is unavailable
+CACHE_STALE_TTL = float(os.getenv("CACHE_STALE_TTL", "3600"))
+
+# Local product catalog index
+CATALOG_ENABLED = os.getenv("CATALOG_ENABLED", "false").lower() in ("1", "true", "yes")
+CATALOG_PAGE_SIZE = int(os.getenv("CATALOG_PAGE_SIZE", "100"))
+
+# Incremental sync (modified_after polling) and webhook receiver
+SYNC_ENABLED = os.getenv("SYNC_ENABLED", str(CATALOG_ENABLED)).lower() in ("1", "true", "yes")
+SYNC_INTERVAL = float(os.getenv("SYNC_INTERVAL", "60"))
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "100"))
+WOO_WEBHOOK_SECRET = os.getenv("WOO_WEBHOOK_SECRET")
+
+# Warm-start snapshot of the catalog index and hot cache entries; an empty path disables it
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "")
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "300"))
+# Snapshots older than this are ignored at startup
+SNAPSHOT_MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE", "3600"))
+SNAPSHOT_CACHE_ENTRIES = int(os.getenv("SNAPSHOT_CACHE_ENTRIES", "5000"))
+
+# summarize_orders: per-day aggregates of closed days are cached and reused
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "3600"))
+ANALYTICS_CACHE_DAYS = int(os.getenv("ANALYTICS_CACHE_DAYS", "400"))
+ANALYTICS_PAGE_SIZE = min(int(os.getenv("ANALYTICS_PAGE_SIZE", "100")), 100)
+
+# Tool results: "json" adds one compact JSON text block next to the structured content, "none" sends structured content only
+RESULT_TEXT_CONTENT = os.getenv("RESULT_TEXT_CONTENT", "json").lower()
+
+# Full exports
+EXPORT_PAGE_SIZE = min(int(os.getenv("EXPORT_PAGE_SIZE", "100")), 100)
+
+# Server processes and MCP sessions. Without a shared session store (or stateless mode)
+# sessions live in one process's memory, so more than one worker needs one of them.
+MCP_WORKERS = int(os.getenv("MCP_WORKERS", "1"))
+MCP_STATELESS = os.getenv("MCP_STATELESS", "false").lower() in ("1", "true", "yes")
+MCP_SESSION_STORE = os.getenv("MCP_SESSION_STORE", "")  # memory, sqlite:<path> or redis://host:port/db
+MCP_SESSION_TTL = float(os.getenv("MCP_SESSION_TTL", "3600"))
+# The upstream rate limit, burst and concurrency cap are budgets for the whole server; each worker gets its share
+WORKER_RATE_LIMIT = WOO_RATE_LIMIT / max(1, MCP_WORKERS)
+WORKER_RATE_BURST = max(1, WOO_RATE_BURST // max(1, MCP_WORKERS))
+WORKER_MAX_CONCURRENCY = max(1, -(-WOO_MAX_CONCURRENCY // max(1, MCP_WORKERS))) if WOO_MAX_CONCURRENCY > 0 else 0
+# JSON-RPC batch arrays on /mcp: tool calls of one batch run at most MCP_BATCH_CONCURRENCY at a time
+MCP_BATCH_CONCURRENCY = int(os.getenv("MCP_BATCH_CONCURRENCY", "8"))
+MCP_BATCH_MAX_SIZE = int(os.getenv("MCP_BATCH_MAX_SIZE", "100"))
+
+def hash_api_key(key: str) -> str:
+    """API keys are only kept in memory as SHA-256 hex digests"""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def _parse_api_keys(value: str) -> dict:
+    """Parse 'alice:<sha256 hex>,bob:<sha256 hex>' into {digest: identity}"""
+    keys = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        name, _, digest = item.strip().rpartition(":")
+        digest = digest.lower()
+        if not name or not re.fullmatch(r"[0-9a-f]{64}", digest):
+            logger.error("MCP_API_KEYS entries must look like name:<sha256 hex digest>, got %r", item.strip()[:20])
+            exit(1)
+        keys[digest] = name
+    return keys
+
+# Prometheus metrics at /metrics; outside the API-key check, optionally behind its own bearer token
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Request tracing: "none", "stdout", "file:<path>" (JSON lines) or "otel" (needs opentelemetry-api)
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")
+# Requests slower than this log their full span breakdown; 0 disables the slow-call log
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "2000"))
+
+# Authentication configuration: a single plain key and/or named SHA-256 hashed keys
 API_KEY = os.getenv("MCP_API_KEY")
-if not API_KEY:
+API_KEYS = _parse_api_keys(os.getenv("MCP_API_KEYS", ""))
+if API_KEY:
+    API_KEYS.setdefault(hash_api_key(API_KEY), "default")
+if not API_KEYS:
     logger.warning("MCP_API_KEY not set - server will run without authentication (NOT RECOMMENDED FOR PRODUCTION)")
 
 # Validate required environment variables
@@ -28,8 +149,15 @@ if WOO_URL == "https://yourstore.com":
     logger.error("WOO_URL must be configured with your actual WooCommerce store URL")
     exit(1)
 
-logger.info(f"Initializing WooCommerce MCP Server for {WOO_URL}")
-if API_KEY:
-    logger.info("Authentication enabled with API key")
+if MCP_WORKERS > 1 and not MCP_STATELESS and MCP_SESSION_STORE in ("", "memory"):
+    logger.error("MCP_WORKERS > 1 needs MCP_STATELESS=true or a shared MCP_SESSION_STORE (sqlite:<path> or redis://...)")
+    exit(1)
+if MCP_WORKERS > 1:
+    logger.warning("Upstream limits are split across %d workers: %.2f requests/s, burst %d, %d concurrent requests each; "
+                   "replicas on other hosts are not accounted for", MCP_WORKERS, WORKER_RATE_LIMIT, WORKER_RATE_BURST, WORKER_MAX_CONCURRENCY)
+
+logger.info("Initializing WooCommerce MCP Server for %s", WOO_URL)
+if API_KEYS:
+    logger.info("Authentication enabled with %d API key(s)", len(API_KEYS))
 else:
     logger.warning("Running without authentication - use MCP_API_KEY for security")
@@ -0,0 +1,68 @@
+import time
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Type
+from fastapi import APIRouter, HTTPException
+from mcp.server.fastmcp import Context
+from pydantic import BaseModel
+from starlette.responses import StreamingResponse
+from .config import EXPORT_PAGE_SIZE, logger
+from .models import ExportSummary, Order, Product, fields_param, project
+from .woo_client import MAX_PER_PAGE, Page, iter_pages
+
+EXPORT_MODELS: Dict[str, Type[BaseModel]] = {"products": Product, "orders": Order}
+
+def to_ndjson(page: Page, model: Type[BaseModel], fields: Optional[Sequence[str]] = None) -> str:
+    """Serialize one page as newline-delimited JSON records shaped by the model"""
+    return "".join(model(**project(item, model, fields)).model_dump_json() + "\n" for item in page.items)
+
+def _projected(resource: str, params: Optional[Dict], fields: Optional[Sequence[str]]) -> Dict:
+    return {**(params or {}), "_fields": fields_param(EXPORT_MODELS[resource], fields)}
+
+async def stream_ndjson(resource: str, params: Optional[Dict] = None, per_page: int = EXPORT_PAGE_SIZE,
+                        fields: Optional[Sequence[str]] = None) -> AsyncIterator[str]:
+    """Yield one NDJSON chunk per upstream page"""
+    model = EXPORT_MODELS[resource]
+    async for page in iter_pages(resource, _projected(resource, params, fields), per_page=min(per_page, MAX_PER_PAGE)):
+        if page.items:
+            yield to_ndjson(page, model, fields)
+
+async def export_with_progress(ctx: Context, resource: str, params: Optional[Dict] = None,
+                               per_page: int = EXPORT_PAGE_SIZE, fields: Optional[Sequence[str]] = None) -> ExportSummary:
+    """Walk every page server-side and send each one as an NDJSON chunk in a progress notification"""
+    if per_page < 1:
+        raise ValueError("per_page must be at least 1")
+    meta = ctx.request_context.meta
+    if meta is None or meta.progressToken is None:
+        raise ValueError(
+            f"export_{resource} streams records as progress notifications; send a progressToken "
+            f"in the request _meta or use GET /export/{resource}.ndjson"
+        )
+
+    model = EXPORT_MODELS[resource]
+    started = time.perf_counter()
+    records = pages = 0
+    total = None
+    async for page in iter_pages(resource, _projected(resource, params, fields), per_page=min(per_page, MAX_PER_PAGE)):
+        pages += 1
+        records += len(page.items)
+        total = page.total if page.total is not None else total
+        if page.items:
+            await ctx.report_progress(progress=records, total=total, message=to_ndjson(page, model, fields))
+
+    summary = ExportSummary(resource=resource, records=records, pages=pages, total=total,
+                            seconds=round(time.perf_counter() - started, 3))
+    logger.info("Exported %d %s in %d pages (%ss)", records, resource, pages, summary.seconds)
+    return summary
+
+router = APIRouter()
+
+@router.get("/export/{resource}.ndjson")
+async def export_ndjson(resource: str, per_page: int = EXPORT_PAGE_SIZE, status: Optional[str] = None,
+                        fields: Optional[str] = None):
+    """Stream a full products/orders export as NDJSON over plain HTTP; fields is a comma-separated list of extras"""
+    if resource not in EXPORT_MODELS:
+        raise HTTPException(status_code=404, detail=f"Unknown export resource: {resource}")
+    if per_page < 1:
+        raise HTTPException(status_code=400, detail="per_page must be at least 1")
+    params = {"status": status} if status else None
+    extra: Optional[List[str]] = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    return StreamingResponse(stream_ndjson(resource, params, per_page, extra), media_type="application/x-ndjson")
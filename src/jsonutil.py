@@ -0,0 +1,19 @@
+import json
+from typing import Any, Union
+
+# orjson is optional; it decodes WooCommerce payloads several times faster than the stdlib
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def loads(data: Union[bytes, memoryview, str]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(bytes(data) if isinstance(data, memoryview) else data)
+
+def dumps(value: Any) -> str:
+    """Compact JSON text"""
+    if orjson is not None:
+        return orjson.dumps(value, default=str).decode()
+    return json.dumps(value, separators=(",", ":"), default=str)
@@ -0,0 +1,139 @@
+import atexit
+import logging
+import queue
+import random
+import sys
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from . import jsonutil
+
+# Correlation ID of the HTTP request being handled; set by TracingMiddleware and WooMCP.call_tool
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# LogRecord attributes that are not user-supplied `extra=` fields; uvicorn's `color_message` is
+# its message with ANSI colour codes, a duplicate of `msg` that has no place in JSON output
+_RECORD_FIELDS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "color_message"}
+
+_counts = {"dropped": 0, "dropped_warnings": 0, "sampled_out": 0}
+
+# Longest a WARNING or above waits for room in a full log queue before it is dropped too
+_WARNING_PUT_TIMEOUT = 0.05
+
+# Libraries logging every request or message at INFO; kept at WARNING unless LOG_LEVEL is DEBUG
+_CHATTY_LOGGERS = ("httpx", "mcp.server.lowlevel.server", "mcp.server.streamable_http")
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, request_id, any `extra=` fields and the traceback"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return jsonutil.dumps(entry)
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s", defaults={"request_id": "-"})
+
+class ContextFilter(logging.Filter):
+    """Runs in the caller: drops sampled-out records and stamps the request ID while its context is current
+
+    `sampling` maps a level to the fraction of its records kept; WARNING and
+    above are always kept.
+    """
+
+    def __init__(self, sampling: Optional[Dict[int, float]] = None):
+        super().__init__()
+        self.sampling = {level: rate for level, rate in (sampling or {}).items() if level < logging.WARNING}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.sampling.get(record.levelno)
+        if rate is not None and random.random() >= rate:
+            _counts["sampled_out"] += 1
+            return False
+        request_id = request_id_var.get()
+        if request_id:
+            record.request_id = request_id
+        return True
+
+class AsyncQueueHandler(QueueHandler):
+    """Hands records to the listener thread without formatting or blocking the event loop
+
+    The stdlib QueueHandler formats in the caller; here `msg % args` is
+    left to the listener thread. When the queue is full, records below
+    WARNING are dropped and counted; warnings and errors wait briefly for
+    room and are then dropped and counted too, so a stalled writer never
+    blocks the event loop for long.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info and not record.exc_text:
+            # Tracebacks reference live frames; render them before they change
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if record.levelno >= logging.WARNING:
+            try:
+                self.queue.put(record, timeout=_WARNING_PUT_TIMEOUT)
+            except queue.Full:
+                _counts["dropped_warnings"] += 1
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _counts["dropped"] += 1
+
+def parse_sampling(rates: Dict[str, float]) -> Dict[int, float]:
+    """{'debug': 0.1} -> {logging.DEBUG: 0.1}"""
+    levels = {}
+    for name, rate in rates.items():
+        level = logging.getLevelName(name.upper())
+        if isinstance(level, int):
+            levels[level] = rate
+    return levels
+
+_listener: Optional[QueueListener] = None
+
+def setup_logging(level: str = "INFO", fmt: str = "json", sampling: Optional[Dict[str, float]] = None, queue_size: int = 10000):
+    """Route the root logger (and uvicorn's, which propagate to it) through a bounded queue to a stderr writer thread"""
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    handler = AsyncQueueHandler(queue.Queue(queue_size))
+    handler.addFilter(ContextFilter(parse_sampling(sampling or {})))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    for name in _CHATTY_LOGGERS:
+        logging.getLogger(name).setLevel(logging.NOTSET if root.level <= logging.DEBUG else logging.WARNING)
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logging.getLogger(name).handlers.clear()
+        logging.getLogger(name).propagate = True
+
+    _listener = QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+def stats() -> Dict[str, int]:
+    return dict(_counts)
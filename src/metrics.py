@@ -0,0 +1,217 @@
+import re
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; covers cache/catalog answers (ms) up to upstream calls near WOO_TIMEOUT
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_ID_SEGMENT = re.compile(r"(?<=/)\d+(?=/|$)")
+
+def endpoint_label(endpoint: str) -> str:
+    """Endpoint with numeric ids folded so label cardinality stays bounded, e.g. 'orders/12' -> 'orders/{id}'"""
+    return _ID_SEGMENT.sub("{id}", endpoint.strip("/").split("?", 1)[0])
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        return self.header() + [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+                                for key, value in sorted(self._values.items())]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (per-bucket counts with a final +Inf slot, sum, count)
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+class Gauge(Metric):
+    """Value read from a callback at scrape time; the callback yields (labels, value) pairs"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]],
+                 labelnames: Sequence[str] = (), kind: Optional[str] = None):
+        super().__init__(name, help, labelnames)
+        self.collect = collect
+        if kind:
+            self.kind = kind
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, value in self.collect():
+            if value is not None:
+                lines.append(f"{self.name}{_labels(self.labelnames, self._key(labels))} {_number(value)}")
+        return lines
+
+class Registry:
+    """Minimal Prometheus registry rendering the text exposition format"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]],
+              labelnames: Sequence[str] = (), kind: Optional[str] = None) -> Gauge:
+        return self.register(Gauge(name, help, collect, labelnames, kind))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+TOOL_CALLS = registry.counter("mcp_tool_calls_total", "MCP tool calls by tool, outcome and API key identity", ("tool", "status", "client"))
+TOOL_DURATION = registry.histogram("mcp_tool_duration_seconds", "MCP tool call latency", ("tool",))
+UPSTREAM_REQUESTS = registry.counter("woo_upstream_requests_total", "WooCommerce requests by method, endpoint and final status",
+                                     ("method", "endpoint", "status"))
+UPSTREAM_DURATION = registry.histogram("woo_upstream_request_duration_seconds", "WooCommerce request latency including retries",
+                                       ("method", "endpoint"))
+
+def register_runtime_metrics(target: Registry = registry):
+    """Scrape-time gauges for the cache, limiter, breaker, coalescing, connection pool, catalog, sync, snapshots and logging"""
+    from . import logs, tracing
+    from .cache import response_cache
+    from .catalog import catalog
+    from .snapshot import snapshots
+    from .sync import store_sync
+    from .woo_client import get_client, inflight_requests
+
+    def stat(name: str, help: str, source: Callable[[], Dict], key: str, kind: str = "gauge"):
+        target.gauge(name, help, lambda: [({}, source()[key])], kind=kind)
+
+    client_stats = lambda: get_client().stats()
+    limiter = lambda: client_stats()["limiter"]
+    breaker = lambda: client_stats()["breaker"]
+    pool = lambda: client_stats()["pool"]
+
+    stat("woo_cache_entries", "Cached responses", response_cache.stats, "entries")
+    stat("woo_cache_bytes", "Payload bytes held by the response cache", response_cache.stats, "bytes")
+    stat("woo_cache_max_bytes", "Response cache byte budget", response_cache.stats, "max_bytes")
+    stat("woo_cache_hits_total", "Response cache hits", response_cache.stats, "hits", "counter")
+    stat("woo_cache_misses_total", "Response cache misses", response_cache.stats, "misses", "counter")
+    stat("woo_cache_evictions_total", "Entries evicted to stay within the byte budget", response_cache.stats, "evictions", "counter")
+    stat("woo_cache_stale_served_total", "Stale responses served while the store was unavailable", response_cache.stats, "stale_served", "counter")
+    stat("woo_cache_discarded_total", "Responses not cached because a write invalidated their resource while they were fetched", response_cache.stats, "discarded", "counter")
+    stat("woo_cache_hit_ratio", "Response cache hit ratio since start", response_cache.stats, "hit_rate")
+
+    stat("woo_limiter_waiting", "Requests queued in the upstream limiter", limiter, "waiting")
+    stat("woo_limiter_in_flight", "Upstream requests in flight", limiter, "in_flight")
+    stat("woo_limiter_admitted_total", "Requests admitted by the upstream limiter", limiter, "admitted", "counter")
+    stat("woo_limiter_wait_seconds_avg", "Average time spent waiting in the limiter", limiter, "avg_wait_seconds")
+    stat("woo_limiter_pauses_total", "Limiter pauses caused by Retry-After", limiter, "pauses", "counter")
+    target.gauge("woo_retries_total", "Upstream retries by reason", lambda: [({"reason": reason}, count)
+                 for reason, count in client_stats()["retries"].items()], ("reason",), kind="counter")
+
+    target.gauge("woo_breaker_state", "Circuit breaker state (1 for the current state)", lambda: [
+        ({"state": state}, 1 if breaker()["state"] == state else 0) for state in ("closed", "open", "half_open")], ("state",))
+    stat("woo_breaker_opened_total", "Times the circuit breaker opened", breaker, "times_opened", "counter")
+    stat("woo_breaker_rejected_total", "Requests failed fast by the open circuit", breaker, "rejected", "counter")
+    stat("woo_breaker_slow_calls_total", "Responses counted as failures for being slow", breaker, "slow_calls", "counter")
+
+    stat("woo_pool_max_connections", "Connection pool size", pool, "max_connections")
+    stat("woo_pool_connections", "Open upstream connections", pool, "connections")
+    stat("woo_pool_idle_connections", "Idle keep-alive upstream connections", pool, "idle")
+
+    stat("woo_singleflight_calls_total", "Upstream GETs started", inflight_requests.stats, "calls", "counter")
+    stat("woo_singleflight_coalesced_total", "GETs that joined an identical in-flight request", inflight_requests.stats, "coalesced", "counter")
+    stat("woo_singleflight_in_flight", "Distinct GETs in flight", inflight_requests.stats, "in_flight")
+
+    target.gauge("catalog_products", "Products in the local catalog index", lambda: [({}, len(catalog))])
+    target.gauge("catalog_ready", "1 once the catalog index is loaded", lambda: [({}, 1 if catalog.ready else 0)])
+
+    resources = lambda key: [({"resource": name}, store_sync.stats()[name][key]) for name in ("products", "orders")]
+    target.gauge("sync_lag_seconds", "Seconds since the last successful sync poll", lambda: resources("lag_seconds"), ("resource",))
+    target.gauge("sync_records_applied_total", "Changed records applied by sync polling", lambda: resources("records_applied"),
+                 ("resource",), kind="counter")
+    target.gauge("sync_errors_total", "Failed sync polls", lambda: resources("errors"), ("resource",), kind="counter")
+    target.gauge("webhooks_total", "Webhooks by outcome", lambda: [
+        ({"outcome": outcome}, store_sync.stats()["webhooks"][outcome]) for outcome in ("received", "rejected")],
+        ("outcome",), kind="counter")
+
+    stat("snapshot_age_seconds", "Seconds since this worker last wrote a warm-start snapshot", snapshots.stats, "last_saved_age_seconds")
+    stat("snapshot_bytes", "Size of the last snapshot written", snapshots.stats, "last_bytes")
+    stat("snapshot_errors_total", "Failed snapshot writes", snapshots.stats, "errors", "counter")
+
+    stat("log_records_dropped_total", "Log records below WARNING dropped because the log queue was full", logs.stats, "dropped", "counter")
+    stat("log_warnings_dropped_total", "WARNING and above log records dropped after waiting for room in a full log queue", logs.stats, "dropped_warnings", "counter")
+    stat("log_records_sampled_out_total", "Log records discarded by LOG_SAMPLING", logs.stats, "sampled_out", "counter")
+    stat("trace_exports_dropped_total", "Finished traces dropped because the trace export queue was full", tracing.stats, "dropped", "counter")
+    stat("trace_export_errors_total", "Traces the exporter failed to write", tracing.stats, "errors", "counter")
@@ -1,7 +1,11 @@
-from typing import List, Dict, Optional
-from pydantic import BaseModel, Field
+from functools import lru_cache
+from typing import Any, List, Dict, Optional, Sequence, Type
+from pydantic import BaseModel, ConfigDict, Field
 
 class Product(BaseModel):
+    # Extra WooCommerce fields are kept when a caller asks for them explicitly
+    model_config = ConfigDict(extra="allow")
+
     id: int
     name: str
     price: Optional[str]
@@ -11,8 +15,83 @@ class Product(BaseModel):
     categories: List[Dict] = Field(default_factory=list)
 
 class Order(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
     id: int
     status: str
     total: str
     customer_id: int
     line_items: List[Dict] = Field(default_factory=list)
+
+class OrdersLookup(BaseModel):
+    orders: List[Order] = Field(default_factory=list)
+    not_found: List[int] = Field(default_factory=list)
+
+class OrderInput(BaseModel):
+    customer_id: int
+    line_items: List[Dict[str, int]]
+    billing: Dict[str, str]
+    shipping: Optional[Dict[str, str]] = None
+
+class OrderBatchItem(BaseModel):
+    index: int
+    order: Optional[Order] = None
+    error: Optional[str] = None
+
+class ExportSummary(BaseModel):
+    resource: str
+    records: int
+    pages: int
+    total: Optional[int] = None
+    seconds: float
+
+class SummaryGroup(BaseModel):
+    key: str
+    name: Optional[str] = None
+    orders: int
+    revenue: float
+    units: int
+    average_order_value: float
+
+class ProductSales(BaseModel):
+    product_id: int
+    name: Optional[str] = None
+    orders: int
+    units: int
+    revenue: float
+
+class OrdersSummary(BaseModel):
+    date_from: str
+    date_to: str
+    group_by: str
+    statuses: Optional[List[str]] = None
+    orders: int
+    revenue: float
+    units: int
+    currencies: List[str] = Field(default_factory=list)
+    groups: List[SummaryGroup] = Field(default_factory=list)
+    total_groups: int
+    top_products: List[ProductSales] = Field(default_factory=list)
+    days_cached: int
+    days_fetched: int
+    seconds: float
+
+@lru_cache(maxsize=None)
+def model_field_names(model: Type[BaseModel]) -> tuple:
+    return tuple(model.model_fields)
+
+def field_names(model: Type[BaseModel], extra: Optional[Sequence[str]] = None) -> List[str]:
+    """The model's own fields followed by any extra WooCommerce fields the caller asked for"""
+    names = list(model_field_names(model))
+    for name in extra or ():
+        if name not in names:
+            names.append(name)
+    return names
+
+def fields_param(model: Type[BaseModel], extra: Optional[Sequence[str]] = None) -> str:
+    """Value for WooCommerce's _fields query parameter projecting responses onto the model"""
+    return ",".join(field_names(model, extra))
+
+def project(item: Dict[str, Any], model: Type[BaseModel], extra: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """Keep only the model fields and requested extras of a WooCommerce record"""
+    return {name: item[name] for name in field_names(model, extra) if name in item}
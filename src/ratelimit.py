@@ -0,0 +1,83 @@
+import asyncio
+import time
+from typing import Any, Dict
+from .config import WORKER_RATE_LIMIT, WORKER_RATE_BURST, WORKER_MAX_CONCURRENCY
+
+class UpstreamLimiter:
+    """Token bucket (requests/second) plus a cap on concurrent upstream requests
+
+    Used as an async context manager around each upstream attempt. Waiters are
+    admitted in arrival order. `pause` holds every new request back, e.g. while
+    the store's Retry-After window is running.
+    """
+
+    def __init__(self, rate: float = WORKER_RATE_LIMIT, burst: int = WORKER_RATE_BURST,
+                 max_concurrency: int = WORKER_MAX_CONCURRENCY):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_concurrency = max_concurrency
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+        self.waiting = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.wait_seconds = 0.0
+        self.pauses = 0
+
+    def _refill(self, now: float):
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds: float):
+        """Hold back new requests for `seconds` (extends, never shortens, a running pause)"""
+        until = time.monotonic() + seconds
+        if until > self._paused_until:
+            self._paused_until = until
+            self.pauses += 1
+
+    async def _take_token(self):
+        async with self._lock:
+            now = time.monotonic()
+            if self._paused_until > now:
+                await asyncio.sleep(self._paused_until - now)
+            if self.rate <= 0:
+                return
+            self._refill(time.monotonic())
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill(time.monotonic())
+            self._tokens -= 1
+
+    async def __aenter__(self):
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            await self._take_token()
+            if self._slots is not None:
+                await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        self.admitted += 1
+        self.wait_seconds += time.monotonic() - started
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.in_flight -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate_limit": self.rate,
+            "max_concurrency": self.max_concurrency,
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "avg_wait_seconds": self.wait_seconds / self.admitted if self.admitted else 0.0,
+            "pauses": self.pauses,
+        }
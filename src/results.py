@@ -0,0 +1,48 @@
+from typing import Any, Dict, List, Optional, Sequence
+from mcp.types import CallToolResult, TextContent
+from pydantic import TypeAdapter
+from . import jsonutil
+from .config import RESULT_TEXT_CONTENT
+from .models import Order, Product, project
+from .woo_client import stale_age
+from .tracing import span
+
+# Whole-list validators: one pydantic-core call per response instead of one model per record
+PRODUCT_LIST = TypeAdapter(List[Product])
+ORDER_LIST = TypeAdapter(List[Order])
+ORDER = TypeAdapter(Order)
+
+def _result(structured: Dict[str, Any], text_value: Any) -> CallToolResult:
+    """Structured content plus, unless disabled, a single compact text block encoded once
+
+    If the call was answered from stale cache the result carries
+    `_meta.stale` and the data's age, plus a short note for the model.
+    """
+    content = []
+    if RESULT_TEXT_CONTENT != "none":
+        content.append(TextContent(type="text", text=jsonutil.dumps(text_value)))
+    age = stale_age.get()
+    if age is None:
+        return CallToolResult(content=content, structuredContent=structured)
+    stale_age.set(None)
+    if content:
+        content.append(TextContent(type="text", text=f"Note: the store is currently unavailable, this is cached data from {age:.0f}s ago."))
+    return CallToolResult(content=content, structuredContent=structured, _meta={"stale": True, "age_seconds": round(age, 1)})
+
+def list_result(adapter: TypeAdapter, model, items: Sequence[Dict], fields: Optional[Sequence[str]] = None) -> CallToolResult:
+    """Validate and serialize a list of WooCommerce records as a tool result"""
+    with span("result.build", records=len(items)):
+        validated = adapter.validate_python([project(item, model, fields) for item in items])
+        records = adapter.dump_python(validated, mode="json")
+        return _result({"result": records}, records)
+
+def products_result(items: Sequence[Dict], fields: Optional[Sequence[str]] = None) -> CallToolResult:
+    return list_result(PRODUCT_LIST, Product, items, fields)
+
+def orders_result(items: Sequence[Dict], fields: Optional[Sequence[str]] = None) -> CallToolResult:
+    return list_result(ORDER_LIST, Order, items, fields)
+
+def order_result(item: Dict, fields: Optional[Sequence[str]] = None) -> CallToolResult:
+    with span("result.build", records=1):
+        record = ORDER.dump_python(ORDER.validate_python(project(item, Order, fields)), mode="json")
+        return _result(record, record)
@@ -1,53 +1,104 @@
+import asyncio
 import contextlib
+import hmac
 from fastapi import FastAPI, Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from starlette.responses import JSONResponse, Response
 import uvicorn
+from .auth import ApiKeyAuth
 from .tools import mcp
-from .config import API_KEY, logger
+from .woo_client import init_client, close_client, get_client, inflight_requests
+from .cache import response_cache
+from .catalog import catalog, warm_catalog
+from .sessions import SharedSessions, create_session_store
+from .batch import BatchRequests
+from .snapshot import snapshots
+from .analytics import order_analytics
+from .metrics import registry, register_runtime_metrics
+from .tracing import TracedApp, TracingMiddleware
+from .config import CATALOG_ENABLED, SYNC_ENABLED, SNAPSHOT_PATH, METRICS_ENABLED, METRICS_TOKEN, TRACE_EXPORTER, TRACE_SLOW_MS, MCP_WORKERS, MCP_STATELESS, MCP_SESSION_STORE, logger
+from .sync import router as sync_router, store_sync, WEBHOOK_PATH
+from .export import router as export_router
 
 app = FastAPI(title="WooCommerce MCP Server", redirect_slashes=False)
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # Authenticate all requests when API key is configured
-        if API_KEY:
-            auth_header = request.headers.get("Authorization")
-            if not auth_header:
-                return Response(
-                    content='{"error": {"code": -32000, "message": "Missing API key"}}',
-                    status_code=401,
-                    media_type="application/json"
-                )
-
-            # Support Bearer token format
-            if auth_header.startswith("Bearer "):
-                provided_key = auth_header[7:]
-            else:
-                provided_key = auth_header
-
-            if provided_key != API_KEY:
-                return Response(
-                    content='{"error": {"code": -32000, "message": "Invalid API key"}}',
-                    status_code=401,
-                    media_type="application/json"
-                )
-
-        return await call_next(request)
-
-app.add_middleware(AuthMiddleware)
+session_store = None if MCP_STATELESS else create_session_store(MCP_SESSION_STORE)
+
+METRICS_PATH = "/metrics"
+
+# Webhooks carry their own HMAC signature instead of an API key; metrics have their own token
+app.add_middleware(ApiKeyAuth, exempt_paths=(WEBHOOK_PATH, METRICS_PATH) if METRICS_ENABLED else (WEBHOOK_PATH,))
+# Added last so it is the outermost layer and times auth too
+app.add_middleware(TracingMiddleware, enabled=TRACE_EXPORTER != "none" or TRACE_SLOW_MS > 0)
 
 @contextlib.asynccontextmanager
 async def lifespan(app: FastAPI):
-    async with mcp.session_manager.run():
-        yield
+    await init_client()
+    # Loaded before the first request is accepted; sync then resumes from the snapshot's watermarks
+    resume = snapshots.restore() if SNAPSHOT_PATH else {}
+    sync_task = None
+    if SYNC_ENABLED:
+        # Watermarks are set before the catalog load; edits arriving during it are replayed after the swap
+        store_sync.start(resume)
+        sync_task = asyncio.create_task(store_sync.run(catch_up=bool(resume)))
+    # The catalog loads in the background; product tools use the live API until it is ready.
+    # A catalog restored from a snapshot is kept current by sync instead of a full pull.
+    catalog_task = None
+    if CATALOG_ENABLED and not (catalog.ready and SYNC_ENABLED):
+        catalog_task = asyncio.create_task(warm_catalog())
+    snapshot_task = asyncio.create_task(snapshots.run()) if SNAPSHOT_PATH else None
+    try:
+        async with mcp.session_manager.run():
+            yield
+    finally:
+        for task in (catalog_task, sync_task, snapshot_task):
+            if task is not None:
+                task.cancel()
+        if SNAPSHOT_PATH:
+            try:
+                await snapshots.save()
+            except OSError:
+                pass  # already logged
+        await close_client()
+        if session_store is not None:
+            await session_store.close()
 
 app.router.lifespan_context = lifespan
-app.mount("/", mcp.streamable_http_app())
+
+@app.get("/upstream/status")
+async def upstream_status():
+    """Limiter queue depth, retry counts, cache, request coalescing, analytics and snapshot counters"""
+    status = {**get_client().stats(), "cache": response_cache.stats(), "coalescing": inflight_requests.stats(),
+              "analytics": order_analytics.stats()}
+    if SNAPSHOT_PATH:
+        status["snapshot"] = snapshots.stats()
+    return status
+
+if METRICS_ENABLED:
+    register_runtime_metrics()
+
+    @app.get(METRICS_PATH)
+    async def metrics(request: Request):
+        """Prometheus text exposition of this worker's metrics"""
+        if METRICS_TOKEN and not hmac.compare_digest(request.headers.get("Authorization", "").encode(),
+                                                     f"Bearer {METRICS_TOKEN}".encode()):
+            return JSONResponse({"error": "Invalid metrics token"}, status_code=401)
+        return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+app.include_router(sync_router)
+app.include_router(export_router)
+mcp_app = mcp.streamable_http_app()
+mcp_path = mcp.settings.streamable_http_path
+# Batches are split after the session check, so a batch costs one session lookup
+mcp_endpoint = BatchRequests(mcp_app, mcp_path)
+app.mount("/", TracedApp(SharedSessions(mcp_endpoint, session_store, mcp_path) if session_store else mcp_endpoint, "mcp.dispatch"))
 
 def start_server():
-    logger.info("Starting WooCommerce MCP Server...")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    logger.info("Starting WooCommerce MCP Server with %d worker(s)...", MCP_WORKERS)
+    if MCP_WORKERS > 1:
+        # Each worker is its own process and imports the app itself
+        uvicorn.run("src.server:app", host="0.0.0.0", port=8000, workers=MCP_WORKERS, log_config=None)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None)
 
 if __name__ == "__main__":
     start_server()
@@ -0,0 +1,308 @@
+import asyncio
+import sqlite3
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse, unquote
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from . import jsonutil
+from .config import MCP_SESSION_TTL, logger
+from .tracing import span
+
+SESSION_HEADER = b"mcp-session-id"
+
+class SessionStore(ABC):
+    """Shared record of open MCP sessions, so any worker or replica can serve any session"""
+
+    def __init__(self, ttl: float = MCP_SESSION_TTL):
+        self.ttl = ttl
+
+    @abstractmethod
+    async def create(self, session_id: str, data: Dict[str, Any]):
+        ...
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Session data, extending its idle timeout; None if unknown or expired"""
+
+    @abstractmethod
+    async def delete(self, session_id: str):
+        ...
+
+    async def close(self):
+        pass
+
+class MemorySessionStore(SessionStore):
+    """Sessions in this process only; for a single worker or for tests"""
+
+    def __init__(self, ttl: float = MCP_SESSION_TTL):
+        super().__init__(ttl)
+        self._sessions: Dict[str, tuple] = {}
+
+    async def create(self, session_id: str, data: Dict[str, Any]):
+        self._sessions[session_id] = (time.time() + self.ttl, data)
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._sessions.get(session_id)
+        if entry is None or entry[0] <= time.time():
+            self._sessions.pop(session_id, None)
+            return None
+        self._sessions[session_id] = (time.time() + self.ttl, entry[1])
+        return entry[1]
+
+    async def delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a SQLite file shared by the worker processes of one host"""
+
+    def __init__(self, path: str, ttl: float = MCP_SESSION_TTL):
+        super().__init__(ttl)
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS mcp_sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)")
+        self._lock = asyncio.Lock()
+
+    async def _run(self, sql: str, *args) -> List[tuple]:
+        async with self._lock:
+            return await asyncio.to_thread(lambda: self._db.execute(sql, args).fetchall())
+
+    async def create(self, session_id: str, data: Dict[str, Any]):
+        await self._run("DELETE FROM mcp_sessions WHERE expires <= ?", time.time())
+        await self._run("INSERT OR REPLACE INTO mcp_sessions VALUES (?, ?, ?)",
+                        session_id, jsonutil.dumps(data), time.time() + self.ttl)
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        rows = await self._run("UPDATE mcp_sessions SET expires = ? WHERE id = ? AND expires > ? RETURNING data",
+                               time.time() + self.ttl, session_id, time.time())
+        return jsonutil.loads(rows[0][0]) if rows else None
+
+    async def delete(self, session_id: str):
+        await self._run("DELETE FROM mcp_sessions WHERE id = ?", session_id)
+
+    async def close(self):
+        self._db.close()
+
+class RedisSessionStore(SessionStore):
+    """Sessions in Redis or any server speaking its protocol (Valkey, KeyDB, a local stand-in)
+
+    Only SET/GETEX/DEL are needed, so this talks RESP directly over one
+    connection instead of pulling in a client library.
+    """
+
+    def __init__(self, url: str, ttl: float = MCP_SESSION_TTL, prefix: str = "mcp:session:"):
+        super().__init__(ttl)
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.db = int(parsed.path.strip("/") or 0)
+        self.prefix = prefix
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _encode(*args: Any) -> bytes:
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    async def _read_reply(self) -> Any:
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("Session store closed the connection")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RuntimeError(f"Session store error: {rest.decode()}")
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            return (await self._reader.readexactly(length + 2))[:-2]
+        if kind == b"*":
+            return [await self._read_reply() for _ in range(int(rest))]
+        raise RuntimeError(f"Unexpected reply from session store: {line!r}")
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            auth = ("AUTH", self.username, self.password) if self.username else ("AUTH", self.password)
+            self._writer.write(self._encode(*auth))
+            await self._read_reply()
+        if self.db:
+            self._writer.write(self._encode("SELECT", self.db))
+            await self._read_reply()
+
+    async def _command(self, *args: Any) -> Any:
+        async with self._lock:
+            try:
+                if self._writer is None or self._writer.is_closing():
+                    await self._connect()
+                self._writer.write(self._encode(*args))
+                await self._writer.drain()
+                return await self._read_reply()
+            except (OSError, ConnectionError, asyncio.IncompleteReadError):
+                # Reconnect on the next command
+                await self._disconnect()
+                raise
+
+    async def _disconnect(self):
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def create(self, session_id: str, data: Dict[str, Any]):
+        await self._command("SET", self.prefix + session_id, jsonutil.dumps(data), "EX", max(1, int(self.ttl)))
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        value = await self._command("GETEX", self.prefix + session_id, "EX", max(1, int(self.ttl)))
+        return jsonutil.loads(value) if value is not None else None
+
+    async def delete(self, session_id: str):
+        await self._command("DEL", self.prefix + session_id)
+
+    async def close(self):
+        await self._disconnect()
+
+def create_session_store(url: str) -> Optional[SessionStore]:
+    """Store for MCP_SESSION_STORE: memory, sqlite:<path> or redis://[user:password@]host[:port][/db]"""
+    if not url:
+        return None
+    if url == "memory":
+        return MemorySessionStore()
+    if url.startswith("sqlite:"):
+        return SQLiteSessionStore(url[len("sqlite:"):].removeprefix("//"))
+    if url.startswith(("redis://", "valkey://")):
+        return RedisSessionStore(url)
+    raise ValueError(f"Unsupported MCP_SESSION_STORE: {url}")
+
+def _error(status: int, message: str) -> List[Message]:
+    body = jsonutil.dumps({"jsonrpc": "2.0", "id": "server-error", "error": {"code": -32600, "message": message}}).encode()
+    return [
+        {"type": "http.response.start", "status": status,
+         "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]},
+        {"type": "http.response.body", "body": body},
+    ]
+
+async def buffer_body(receive: Receive):
+    """Read the whole request body and return it with a receive that replays it"""
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    body = b"".join(chunks)
+    replayed = False
+
+    async def replay() -> Message:
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return body, replay
+
+def _initialize_params(body: bytes) -> Optional[Dict[str, Any]]:
+    """Params of an initialize request, or None for any other message"""
+    try:
+        message = jsonutil.loads(body)
+    except ValueError:
+        return None
+    if isinstance(message, dict) and message.get("method") == "initialize":
+        return message.get("params") or {}
+    return None
+
+class SharedSessions:
+    """MCP session handling on top of the SDK's stateless transport
+
+    The SDK keeps live sessions in process memory. Here the transport runs
+    stateless and this layer issues `Mcp-Session-Id` on initialize, records
+    the session in a shared store and checks it on every later request, so
+    any worker or replica can answer any session.
+    """
+
+    def __init__(self, app: ASGIApp, store: SessionStore, path: str = "/mcp"):
+        self.app = app
+        self.store = store
+        self.path = path.rstrip("/")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].rstrip("/") != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        session_id = None
+        for name, value in scope["headers"]:
+            if name == SESSION_HEADER:
+                session_id = value.decode("latin-1")
+                break
+        owner = scope.get("state", {}).get("api_key_id")
+        method = scope["method"]
+
+        if session_id is not None:
+            with span("mcp.session", store=type(self.store).__name__):
+                session = await self.store.get(session_id)
+            # A session can only be used with the key that created it; answer as if it did not exist
+            if session is None or session.get("api_key_id") != owner:
+                await self._reply(send, _error(404, "Session not found"))
+                return
+            if method == "DELETE":
+                await self.store.delete(session_id)
+                await self._reply(send, [{"type": "http.response.start", "status": 200, "headers": []},
+                                         {"type": "http.response.body", "body": b""}])
+                return
+            await self.app(scope, receive, send)
+            return
+
+        if method == "GET":
+            # No standalone server-to-client stream without a session
+            await self._reply(send, _error(405, "Method Not Allowed"))
+            return
+        if method != "POST":
+            await self._reply(send, _error(400, "Bad Request: Missing session ID"))
+            return
+
+        body, receive = await buffer_body(receive)
+        params = _initialize_params(body)
+        if params is None:
+            await self._reply(send, _error(400, "Bad Request: Missing session ID"))
+            return
+
+        new_id = uuid.uuid4().hex
+
+        async def send_with_session(message: Message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                await self.store.create(new_id, {
+                    "api_key_id": owner,
+                    "client": params.get("clientInfo"),
+                    "protocol_version": params.get("protocolVersion"),
+                    "created": time.time(),
+                })
+                message = {**message, "headers": [*message.get("headers", []), (SESSION_HEADER, new_id.encode())]}
+                logger.info("Opened MCP session %s", new_id)
+            await send(message)
+
+        await self.app(scope, receive, send_with_session)
+
+    @staticmethod
+    async def _reply(send: Send, messages: List[Message]):
+        for message in messages:
+            await send(message)
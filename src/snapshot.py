@@ -0,0 +1,196 @@
+import asyncio
+import mmap
+import os
+import struct
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+from . import jsonutil
+from .cache import ResponseCache, response_cache
+from .catalog import CatalogIndex, STORED_FIELDS, catalog
+from .config import CATALOG_ENABLED, SNAPSHOT_CACHE_ENTRIES, SNAPSHOT_INTERVAL, SNAPSHOT_MAX_AGE, SNAPSHOT_PATH, logger
+from .sync import StoreSync, store_sync
+
+# File layout: magic, format version and header length, then a JSON header with
+# each section's (offset, length, crc32) relative to the end of the header, then
+# the sections as compact JSON. Sections are not compressed so they decode
+# straight out of the memory mapping.
+MAGIC = b"WOOSNAP\0"
+FORMAT_VERSION = 1
+_PREFIX = struct.Struct("<8sHI")
+
+# Cached reads worth keeping across a restart: product listings/searches and recent orders
+SNAPSHOT_RESOURCES = ("products", "orders")
+
+class SnapshotError(Exception):
+    """Unreadable, corrupt or incompatible snapshot file"""
+
+def write_snapshot(path: str, sections: Dict[str, bytes], meta: Dict[str, Any]) -> int:
+    """Write the snapshot atomically (temporary file, fsync, rename); returns its size in bytes"""
+    offset = 0
+    table = {}
+    for name, data in sections.items():
+        table[name] = [offset, len(data), zlib.crc32(data)]
+        offset += len(data)
+    header = jsonutil.dumps({**meta, "sections": table}).encode()
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for data in sections.values():
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+    return _PREFIX.size + len(header) + offset
+
+def read_snapshot(path: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """(header, decoded sections) of a snapshot file, memory-mapped when the platform allows it"""
+    with open(path, "rb") as f:
+        try:
+            buffer: Any = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            buffer = f.read()
+    view = memoryview(buffer)
+    try:
+        if len(view) < _PREFIX.size:
+            raise SnapshotError("truncated file")
+        magic, version, header_length = _PREFIX.unpack_from(view)
+        if magic != MAGIC:
+            raise SnapshotError("not a snapshot file")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"format version {version}, expected {FORMAT_VERSION}")
+        start = _PREFIX.size + header_length
+        # Slices are released before the mapping is closed, error or not
+        with view[_PREFIX.size:start] as data:
+            header = jsonutil.loads(data)
+        sections = {}
+        for name, (offset, length, crc) in header["sections"].items():
+            with view[start + offset:start + offset + length] as data:
+                if len(data) != length or zlib.crc32(data) != crc:
+                    raise SnapshotError(f"section {name} is corrupt")
+                sections[name] = jsonutil.loads(data)
+        return header, sections
+    except (ValueError, KeyError, TypeError, struct.error) as e:
+        raise SnapshotError(str(e)) from e
+    finally:
+        view.release()
+        if isinstance(buffer, mmap.mmap):
+            buffer.close()
+
+def _iso(moment: Optional[datetime]) -> Optional[str]:
+    return moment.isoformat() if moment else None
+
+class Snapshots:
+    """Periodic warm-start snapshots of the catalog index and the hottest cached reads
+
+    The catalog is saved with its term weights so loading it skips
+    tokenizing. Cache entries keep their remaining TTL and stale window, and
+    the time spent on disk counts against them, so a restart never extends
+    how long a response may be served. The sync watermarks are saved too, so
+    the first sync poll after a restart picks up what changed in between.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_PATH, max_age: float = SNAPSHOT_MAX_AGE,
+                 cache_entries: int = SNAPSHOT_CACHE_ENTRIES, index: CatalogIndex = catalog,
+                 cache: ResponseCache = response_cache, sync: StoreSync = store_sync):
+        self.path = path
+        self.max_age = max_age
+        self.cache_entries = cache_entries
+        self.index = index
+        self.cache = cache
+        self.sync = sync
+        self.saves = 0
+        self.errors = 0
+        self.last_saved_at: Optional[float] = None
+        self.last_save_seconds = 0.0
+        self.last_bytes = 0
+        self.restored: Dict[str, Any] = {}
+
+    def _collect(self) -> Tuple[Dict[str, bytes], Dict[str, Any]]:
+        sections = {"cache": jsonutil.dumps(self.cache.export_entries(SNAPSHOT_RESOURCES, self.cache_entries)).encode()}
+        watermarks = {"products": None, "orders": _iso(self.sync.orders.watermark)}
+        if self.index.ready:
+            sections["catalog"] = jsonutil.dumps(self.index.export_state()).encode()
+            # Without sync the catalog is as fresh as its last full load
+            loaded = datetime.fromtimestamp(self.index.loaded_at, timezone.utc).replace(tzinfo=None)
+            watermarks["products"] = _iso(self.sync.products.watermark) or _iso(loaded)
+        meta = {"created_at": time.time(), "catalog_fields": list(STORED_FIELDS),
+                "catalog_loaded_at": self.index.loaded_at, "watermarks": watermarks}
+        return sections, meta
+
+    async def save(self) -> int:
+        """Write a snapshot now; returns its size in bytes"""
+        started = time.perf_counter()
+        # Collected on the event loop so nothing changes underneath; only the file I/O runs in a thread
+        sections, meta = self._collect()
+        try:
+            size = await asyncio.to_thread(write_snapshot, self.path, sections, meta)
+        except OSError as e:
+            self.errors += 1
+            logger.error("Snapshot write to %s failed: %s", self.path, e)
+            raise
+        self.saves += 1
+        self.last_saved_at = meta["created_at"]
+        self.last_save_seconds = time.perf_counter() - started
+        self.last_bytes = size
+        logger.debug("Snapshot written: %d bytes in %.3fs", size, self.last_save_seconds)
+        return size
+
+    def restore(self) -> Dict[str, datetime]:
+        """Load the snapshot if it is recent enough; returns the sync watermarks to resume from"""
+        started = time.perf_counter()
+        try:
+            header, sections = read_snapshot(self.path)
+        except FileNotFoundError:
+            logger.info("No snapshot at %s, starting cold", self.path)
+            return {}
+        except (OSError, SnapshotError) as e:
+            logger.warning("Ignoring snapshot %s: %s", self.path, e)
+            return {}
+
+        age = time.time() - header["created_at"]
+        if age > self.max_age or age < 0:
+            logger.warning("Ignoring snapshot %s: %.0fs old, SNAPSHOT_MAX_AGE is %.0fs", self.path, age, self.max_age)
+            return {}
+
+        resume: Dict[str, datetime] = {}
+        restored = {"age_seconds": round(age, 1), "products": 0, "cache_entries": 0}
+        watermarks = header.get("watermarks") or {}
+        if CATALOG_ENABLED and "catalog" in sections and header.get("catalog_fields") == list(STORED_FIELDS):
+            self.index.load_state(sections["catalog"], header["catalog_loaded_at"])
+            restored["products"] = len(self.index)
+            if watermarks.get("products"):
+                resume["products"] = datetime.fromisoformat(watermarks["products"])
+        restored["cache_entries"] = self.cache.restore(sections.get("cache", []), age)
+        if restored["cache_entries"] and watermarks.get("orders"):
+            resume["orders"] = datetime.fromisoformat(watermarks["orders"])
+
+        restored["seconds"] = round(time.perf_counter() - started, 3)
+        self.restored = restored
+        logger.info("Snapshot restored: %d products, %d cache entries, %.0fs old, loaded in %.3fs",
+                    restored["products"], restored["cache_entries"], age, restored["seconds"])
+        return resume
+
+    async def run(self, interval: float = SNAPSHOT_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.save()
+            except OSError:
+                pass  # already logged and counted; retried on the next interval
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "saves": self.saves,
+            "errors": self.errors,
+            "last_saved_age_seconds": time.time() - self.last_saved_at if self.last_saved_at else None,
+            "last_save_seconds": self.last_save_seconds,
+            "last_bytes": self.last_bytes,
+            "restored": self.restored,
+        }
+
+snapshots = Snapshots()
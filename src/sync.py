@@ -0,0 +1,236 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+from fastapi import APIRouter, Request
+from starlette.responses import JSONResponse
+from . import jsonutil
+from .cache import response_cache, estimate_size
+from .analytics import order_analytics
+from .catalog import catalog, SYNC_FIELDS
+from .config import CATALOG_ENABLED, SYNC_INTERVAL, SYNC_PAGE_SIZE, WOO_WEBHOOK_SECRET, logger
+from .woo_client import make_request
+
+# Re-read a short window before the watermark so same-second edits are never missed
+WATERMARK_OVERLAP = timedelta(seconds=2)
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _parse_gmt(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.rstrip("Z"))
+    except ValueError:
+        return None
+
+def apply_product(product: Dict[str, Any]):
+    """Apply a product change to the catalog index and drop cached product reads"""
+    if CATALOG_ENABLED:
+        catalog.upsert(product)
+    response_cache.invalidate(f"products/{product['id']}")
+
+def remove_product(product_id: int):
+    if CATALOG_ENABLED:
+        catalog.remove(product_id)
+    response_cache.invalidate(f"products/{product_id}")
+
+def apply_order(order: Dict[str, Any]):
+    """Write a changed order through to the cache and drop stale order listings and day aggregates"""
+    response_cache.invalidate(f"orders/{order['id']}")
+    order_analytics.invalidate(order)
+    response_cache.set(f"orders/{order['id']}", order, estimate_size(order))
+
+def remove_order(order_id: int):
+    response_cache.invalidate(f"orders/{order_id}")
+
+class ResourceSync:
+    """Pull records of one resource changed since the last watermark"""
+
+    def __init__(self, resource: str, apply: Callable[[Dict[str, Any]], None],
+                 params: Optional[Dict[str, Any]] = None, page_size: int = SYNC_PAGE_SIZE):
+        self.resource = resource
+        self.apply = apply
+        self.params = params or {}
+        self.page_size = page_size
+        self.watermark: Optional[datetime] = None
+        self.last_success: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_duration = 0.0
+        self.last_count = 0
+        self.records_applied = 0
+        self.runs = 0
+        self.errors = 0
+
+    def start_from(self, watermark: datetime):
+        self.watermark = watermark
+
+    async def poll(self) -> int:
+        """Apply every record modified after the watermark; returns the number applied"""
+        started = time.perf_counter()
+        poll_started_at = _utcnow()
+        since = (self.watermark or poll_started_at) - WATERMARK_OVERLAP
+        newest = self.watermark
+        count = 0
+        page = 1
+        self.runs += 1
+        try:
+            while True:
+                params = {
+                    **self.params,
+                    "modified_after": since.isoformat(timespec="seconds"),
+                    "dates_are_gmt": "true",
+                    "per_page": self.page_size,
+                    "page": page,
+                }
+                records: List[Dict[str, Any]] = await make_request(self.resource, params=params, use_cache=False)
+                for record in records:
+                    self.apply(record)
+                    modified = _parse_gmt(record.get("date_modified_gmt"))
+                    if modified and (newest is None or modified > newest):
+                        newest = modified
+                count += len(records)
+                if len(records) < self.page_size:
+                    break
+                page += 1
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            logger.error("Sync of %s failed after %d records: %s", self.resource, count, e)
+            raise
+
+        self.watermark = newest or poll_started_at
+        self.last_success = time.time()
+        self.last_duration = time.perf_counter() - started
+        self.last_count = count
+        self.records_applied += count
+        self.last_error = None
+        if count:
+            logger.info("Synced %d changed %s in %.2fs", count, self.resource, self.last_duration)
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "lag_seconds": time.time() - self.last_success if self.last_success else None,
+            "last_duration_seconds": self.last_duration,
+            "last_count": self.last_count,
+            "throughput_per_second": self.last_count / self.last_duration if self.last_duration else 0.0,
+            "records_applied": self.records_applied,
+            "runs": self.runs,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+class StoreSync:
+    """Background incremental sync of products and orders plus webhook bookkeeping"""
+
+    def __init__(self, interval: float = SYNC_INTERVAL):
+        self.interval = interval
+        # status=any so trashed or unpublished products are seen and dropped from the index
+        self.products = ResourceSync("products", apply_product, {"status": "any", "_fields": ",".join(SYNC_FIELDS + ("date_modified_gmt",))})
+        self.orders = ResourceSync("orders", apply_order)
+        self.webhooks_received = 0
+        self.webhooks_rejected = 0
+        self.last_webhook_lag: Optional[float] = None
+
+    def start(self, resume: Optional[Dict[str, datetime]] = None):
+        """Set watermarks to now, or to `resume` for data restored from a snapshot
+
+        Call before the full catalog load so edits made during it are re-polled.
+        """
+        now = _utcnow()
+        resume = resume or {}
+        self.products.start_from(resume.get("products", now))
+        self.orders.start_from(resume.get("orders", now))
+
+    async def run(self, catch_up: bool = False):
+        """Poll every `interval` seconds; `catch_up` polls once right away, e.g. after a snapshot restore"""
+        if catch_up:
+            await self.poll_all()
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.poll_all()
+
+    async def poll_all(self):
+        for resource in (self.products, self.orders):
+            try:
+                await resource.poll()
+            except Exception:
+                pass  # already logged and counted; retried on the next interval
+
+    def apply_webhook(self, topic: str, payload: Dict[str, Any]):
+        resource, _, event = topic.partition(".")
+        if resource == "product" and event == "deleted":
+            remove_product(payload["id"])
+        elif resource == "product":
+            apply_product(payload)
+        elif resource == "order" and event == "deleted":
+            remove_order(payload["id"])
+        elif resource == "order":
+            apply_order(payload)
+        else:
+            logger.info("Ignoring webhook topic %s", topic)
+            return
+        modified = _parse_gmt(payload.get("date_modified_gmt"))
+        if modified:
+            self.last_webhook_lag = (_utcnow() - modified).total_seconds()
+        self.webhooks_received += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "products": self.products.stats(),
+            "orders": self.orders.stats(),
+            "webhooks": {
+                "received": self.webhooks_received,
+                "rejected": self.webhooks_rejected,
+                "last_lag_seconds": self.last_webhook_lag,
+            },
+        }
+
+store_sync = StoreSync()
+
+def verify_signature(body: bytes, signature: Optional[str], secret: str) -> bool:
+    """WooCommerce signs the raw body as base64(HMAC-SHA256(secret, body))"""
+    if not signature:
+        return False
+    expected = base64.b64encode(hmac.new(secret.encode(), body, hashlib.sha256).digest()).decode()
+    return hmac.compare_digest(expected, signature)
+
+router = APIRouter()
+
+WEBHOOK_PATH = "/webhooks/woocommerce"
+
+@router.post(WEBHOOK_PATH)
+async def woocommerce_webhook(request: Request):
+    """Receive signed WooCommerce product/order webhooks"""
+    if not WOO_WEBHOOK_SECRET:
+        return JSONResponse({"error": "Webhook secret not configured"}, status_code=503)
+
+    body = await request.body()
+    topic = request.headers.get("X-WC-Webhook-Topic")
+    # WooCommerce sends an unsigned form-encoded ping when a webhook is created
+    if topic is None and body.startswith(b"webhook_id="):
+        return JSONResponse({"status": "ok"})
+
+    if not verify_signature(body, request.headers.get("X-WC-Webhook-Signature"), WOO_WEBHOOK_SECRET):
+        store_sync.webhooks_rejected += 1
+        logger.warning("Rejected webhook with invalid signature (topic %s)", topic)
+        return JSONResponse({"error": "Invalid signature"}, status_code=401)
+
+    try:
+        payload = jsonutil.loads(body)
+        store_sync.apply_webhook(topic or "", payload)
+    except (ValueError, KeyError, TypeError) as e:
+        logger.error("Invalid webhook payload for topic %s: %s", topic, e)
+        return JSONResponse({"error": "Invalid payload"}, status_code=400)
+    return JSONResponse({"status": "ok"})
+
+@router.get("/sync/status")
+async def sync_status():
+    """Sync watermarks, lag and throughput"""
+    return store_sync.stats()
@@ -1,87 +1,279 @@
-from typing import List, Dict, Optional
-from mcp.server.fastmcp import FastMCP
-from .woo_client import make_request
-from .models import Product, Order
-from .config import logger
+import asyncio
+import time
+from typing import Annotated, Any, List, Dict, Optional
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.types import CallToolResult
+from .woo_client import MAX_PER_PAGE, make_request, fetch_all_pages
+from .models import Product, Order, OrderInput, OrderBatchItem, OrdersLookup, OrdersSummary, ExportSummary, field_names, fields_param, project
+from .cache import response_cache, estimate_size
+from .catalog import catalog, STORED_FIELDS
+from .config import CATALOG_ENABLED, EXPORT_PAGE_SIZE, MCP_STATELESS, MCP_SESSION_STORE, BATCH_SIZE, BATCH_CONCURRENCY, PAGINATION_CONCURRENCY, logger
+from .export import export_with_progress
+from .analytics import order_analytics
+from .results import products_result, orders_result, order_result
+from .metrics import TOOL_CALLS, TOOL_DURATION
+from .tracing import span
+from .logs import request_id_var
 
-mcp = FastMCP("WooCommerce MCP Server")
+class WooMCP(FastMCP):
+    """FastMCP recording call count, outcome and latency per tool"""
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]):
+        started = time.perf_counter()
+        status = "error"
+        state = self._request_state()
+        id_token = request_id_var.set(state.get("request_id"))
+        # Tool names come from the client; unregistered ones share a label so they can't grow the series
+        label = name if self._tool_manager.get_tool(name) is not None else "unknown"
+        try:
+            # Tools run in the session's task, so the HTTP request's span is passed explicitly
+            with span(f"tool.{label}", parent=state.get("trace_span"), tool=label):
+                result = await super().call_tool(name, arguments)
+            status = "ok"
+            return result
+        finally:
+            request_id_var.reset(id_token)
+            TOOL_DURATION.observe(time.perf_counter() - started, tool=label)
+            TOOL_CALLS.inc(tool=label, status=status, client=state.get("api_key_id") or "")
+
+    def _request_state(self) -> Dict[str, Any]:
+        """Scope state of the HTTP request carrying this call (API key identity, trace span, request ID); empty outside HTTP"""
+        try:
+            request = self.get_context().request_context.request
+        except (LookupError, ValueError):
+            return {}
+        return getattr(request, "scope", {}).get("state", {}) if request is not None else {}
+
+# With a shared session store the SDK transport runs stateless and sessions are tracked in src/sessions.py
+mcp = WooMCP("WooCommerce MCP Server", stateless_http=MCP_STATELESS or bool(MCP_SESSION_STORE))
+
+def _use_catalog(live: bool, fields: Optional[List[str]] = None) -> bool:
+    """Serve product reads from the local index unless disabled, not loaded yet, live data was asked for,
+    or the caller wants fields the index doesn't keep"""
+    if fields and not set(fields) <= set(STORED_FIELDS):
+        return False
+    return CATALOG_ENABLED and catalog.ready and not live
+
+def _cached_item(endpoint: str, model, fields: Optional[List[str]] = None) -> Optional[Dict]:
+    """A cached single item (e.g. written through by create_order or a webhook) holding every needed field"""
+    # A probe ahead of the real read: it must not skew the hit rate
+    cached = response_cache.peek(endpoint)
+    if cached is not None and all(name in cached for name in field_names(model, fields)):
+        return cached
+    return None
+
+def _order_payload(customer_id: int, line_items: List[Dict[str, int]], billing: Dict[str, str], shipping: Optional[Dict[str, str]] = None) -> Dict:
+    return {
+        "customer_id": customer_id,
+        "line_items": [{"product_id": item["product_id"], "quantity": item["quantity"]} for item in line_items],
+        "billing": billing,
+        "shipping": shipping or billing,
+        "set_paid": False
+    }
+
+@mcp.tool()
+async def list_products(per_page: Optional[int] = None, page: int = 1, category: Optional[int] = None, stock_status: Optional[str] = None, live: bool = False, all_pages: bool = False, fields: Optional[List[str]] = None) -> Annotated[CallToolResult, List[Product]]:
+    """List all products with pagination, optionally filtered by category ID or stock status (instock, outofstock, onbackorder). per_page defaults to 20. Set all_pages=true to get every page (per_page is then the page size, default and max 100). Set live=true to bypass the local catalog index. Use fields to add extra WooCommerce product fields (e.g. ["sku", "permalink"]) to each result."""
+    try:
+        per_page = per_page or (MAX_PER_PAGE if all_pages else 20)
+        logger.debug("Listing products: page %s, per_page %s, all_pages %s", page, per_page, all_pages)
+        if _use_catalog(live, fields):
+            if all_pages:
+                products = catalog.list(per_page=len(catalog), page=1, category=category, stock_status=stock_status)
+            else:
+                products = catalog.list(per_page=per_page, page=page, category=category, stock_status=stock_status)
+        else:
+            # Published products only, like the catalog index, so both paths return the same products
+            params = {"status": "publish", "_fields": fields_param(Product, fields)}
+            if category:
+                params["category"] = category
+            if stock_status:
+                params["stock_status"] = stock_status
+            if all_pages:
+                products = await fetch_all_pages("products", params=params, per_page=per_page)
+            else:
+                products = await make_request("products", params={"per_page": per_page, "page": page, **params})
+        result = products_result(products, fields)
+        logger.debug("Retrieved %d products", len(products))
+        return result
+    except Exception as e:
+        logger.error("Error in list_products: %s", e)
+        raise
 
 @mcp.tool()
-def list_products(per_page: int = 20, page: int = 1) -> List[Product]:
-    """List all products with pagination"""
+async def search_products(query: str, per_page: int = 10, category: Optional[int] = None, stock_status: Optional[str] = None, live: bool = False, fields: Optional[List[str]] = None) -> Annotated[CallToolResult, List[Product]]:
+    """Search for products by name or SKU, optionally filtered by category ID or stock status. Set live=true to bypass the local catalog index. Use fields to add extra WooCommerce product fields to each result."""
     try:
-        logger.info(f"Listing products: page {page}, per_page {per_page}")
-        params = {"per_page": per_page, "page": page}
-        products = make_request("products", params=params)
-        result = [Product(**p) for p in products]
-        logger.info(f"Retrieved {len(result)} products")
+        logger.debug("Searching products with query: %s", query)
+        if _use_catalog(live, fields):
+            products = catalog.search(query, per_page=per_page, category=category, stock_status=stock_status)
+        else:
+            params = {"search": query, "status": "publish", "per_page": per_page, "_fields": fields_param(Product, fields)}
+            if category:
+                params["category"] = category
+            if stock_status:
+                params["stock_status"] = stock_status
+            products = await make_request("products", params=params)
+        result = products_result(products, fields)
+        logger.debug("Found %d products", len(products))
         return result
     except Exception as e:
-        logger.error(f"Error in list_products: {e}")
-        return []
+        logger.error("Error in search_products: %s", e)
+        raise
 
 @mcp.tool()
-def search_products(query: str, per_page: int = 10) -> List[Product]:
-    """Search for products by name or SKU"""
+async def create_order(customer_id: int, line_items: List[Dict[str, int]], billing: Dict[str, str], shipping: Optional[Dict[str, str]] = None, fields: Optional[List[str]] = None) -> Annotated[CallToolResult, Order]:
+    """Create a new order. Use fields to add extra WooCommerce order fields to the result."""
     try:
-        logger.info(f"Searching products with query: {query}")
-        params = {"search": query, "per_page": per_page}
-        products = make_request("products", params=params)
-        result = [Product(**p) for p in products]
-        logger.info(f"Found {len(result)} products")
+        logger.debug("Creating order for customer %s", customer_id)
+        order_data = _order_payload(customer_id, line_items, billing, shipping)
+        order = await make_request("orders", method="POST", params={"_fields": fields_param(Order, fields)}, data=order_data)
+        result = order_result(order, fields)
+        logger.info("Order created with ID: %s", order["id"])
         return result
     except Exception as e:
-        logger.error(f"Error in search_products: {e}")
-        return []
+        logger.error("Error in create_order: %s", e)
+        raise
 
 @mcp.tool()
-def create_order(customer_id: int, line_items: List[Dict[str, int]], billing: Dict[str, str], shipping: Optional[Dict[str, str]] = None) -> Order:
-    """Create a new order"""
+async def create_orders_batch(orders: List[OrderInput]) -> List[OrderBatchItem]:
+    """Create many orders at once through the WooCommerce batch endpoint. Returns one result per input, in order, with either the created order or an error."""
     try:
-        logger.info(f"Creating order for customer {customer_id}")
-        order_data = {
-            "customer_id": customer_id,
-            "line_items": [{"product_id": item["product_id"], "quantity": item["quantity"]} for item in line_items],
-            "billing": billing,
-            "shipping": shipping or billing,
-            "set_paid": False
-        }
-        order = make_request("orders", method="POST", data=order_data)
-        result = Order(**order)
-        logger.info(f"Order created with ID: {result.id}")
+        logger.debug("Creating %d orders in batches of %d", len(orders), BATCH_SIZE)
+        semaphore = asyncio.Semaphore(max(1, BATCH_CONCURRENCY))
+
+        async def create_chunk(start: int) -> List[OrderBatchItem]:
+            chunk = orders[start:start + BATCH_SIZE]
+            payload = {"create": [_order_payload(o.customer_id, o.line_items, o.billing, o.shipping) for o in chunk]}
+            try:
+                async with semaphore:
+                    response = await make_request("orders/batch", method="POST", data=payload)
+            except Exception as e:
+                return [OrderBatchItem(index=start + i, error=str(e)) for i in range(len(chunk))]
+
+            created = response.get("create", [])
+            results = []
+            for i in range(len(chunk)):
+                item = created[i] if i < len(created) else {"error": {"message": "Missing from batch response"}}
+                if item.get("error"):
+                    results.append(OrderBatchItem(index=start + i, error=item["error"].get("message", str(item["error"]))))
+                else:
+                    results.append(OrderBatchItem(index=start + i, order=Order(**project(item, Order))))
+            return results
+
+        chunks = await asyncio.gather(*(create_chunk(start) for start in range(0, len(orders), BATCH_SIZE)))
+        result = [item for chunk in chunks for item in chunk]
+        failed = sum(1 for item in result if item.error)
+        logger.info("Batch created %d orders, %d failed", len(result) - failed, failed)
         return result
     except Exception as e:
-        logger.error(f"Error in create_order: {e}")
+        logger.error("Error in create_orders_batch: %s", e)
         raise
 
 @mcp.tool()
-def get_order(order_id: int) -> Order:
-    """Retrieve a specific order by ID"""
+async def get_order(order_id: int, fields: Optional[List[str]] = None) -> Annotated[CallToolResult, Order]:
+    """Retrieve a specific order by ID. Use fields to add extra WooCommerce order fields (e.g. ["billing", "date_created"])."""
     try:
-        logger.info(f"Retrieving order {order_id}")
-        order = make_request(f"orders/{order_id}")
-        result = Order(**order)
-        logger.info(f"Retrieved order {order_id}")
+        logger.debug("Retrieving order %s", order_id)
+        order = _cached_item(f"orders/{order_id}", Order, fields)
+        if order is None:
+            order = await make_request(f"orders/{order_id}", params={"_fields": fields_param(Order, fields)})
+        result = order_result(order, fields)
+        logger.debug("Retrieved order %s", order_id)
         return result
     except Exception as e:
-        logger.error(f"Error in get_order: {e}")
+        logger.error("Error in get_order: %s", e)
         raise
 
 @mcp.tool()
-def list_orders(customer_id: Optional[int] = None, status: Optional[str] = None, per_page: int = 10) -> List[Order]:
-    """List orders with optional filters"""
+async def get_orders(order_ids: List[int], fields: Optional[List[str]] = None) -> OrdersLookup:
+    """Retrieve several orders by ID in as few requests as possible. IDs that don't exist are reported in not_found instead of failing the call. Use fields to add extra WooCommerce order fields."""
     try:
-        logger.info(f"Listing orders with filters: customer_id={customer_id}, status={status}")
-        params = {"per_page": per_page}
+        wanted = list(dict.fromkeys(order_ids))
+        logger.debug("Retrieving %d orders", len(wanted))
+        found: Dict[int, Dict] = {}
+        missing = []
+        for order_id in wanted:
+            cached = _cached_item(f"orders/{order_id}", Order, fields)
+            if cached is not None:
+                found[order_id] = cached
+            else:
+                missing.append(order_id)
+
+        semaphore = asyncio.Semaphore(max(1, PAGINATION_CONCURRENCY))
+
+        async def fetch_chunk(ids: List[int]) -> List[Dict]:
+            params = {"include": ",".join(str(i) for i in ids), "per_page": len(ids), "_fields": fields_param(Order, fields)}
+            async with semaphore:
+                return await make_request("orders", params=params, use_cache=False)
+
+        chunks = await asyncio.gather(*(fetch_chunk(missing[i:i + 100]) for i in range(0, len(missing), 100)))
+        for chunk in chunks:
+            for order in chunk:
+                found[order["id"]] = order
+                response_cache.set(f"orders/{order['id']}", order, estimate_size(order))
+
+        result = OrdersLookup(
+            orders=[Order(**project(found[order_id], Order, fields)) for order_id in wanted if order_id in found],
+            not_found=[order_id for order_id in wanted if order_id not in found],
+        )
+        logger.debug("Retrieved %d orders (%d cached), %d not found", len(result.orders), len(wanted) - len(missing), len(result.not_found))
+        return result
+    except Exception as e:
+        logger.error("Error in get_orders: %s", e)
+        raise
+
+@mcp.tool()
+async def list_orders(customer_id: Optional[int] = None, status: Optional[str] = None, per_page: Optional[int] = None, all_pages: bool = False, fields: Optional[List[str]] = None) -> Annotated[CallToolResult, List[Order]]:
+    """List orders with optional filters; per_page defaults to 10. Set all_pages=true to get every matching order (per_page is then the page size, default and max 100). Use fields to add extra WooCommerce order fields."""
+    try:
+        per_page = per_page or (MAX_PER_PAGE if all_pages else 10)
+        logger.debug("Listing orders with filters: customer_id=%s, status=%s, all_pages=%s", customer_id, status, all_pages)
+        params = {"_fields": fields_param(Order, fields)}
         if customer_id:
             params["customer"] = customer_id
         if status:
             params["status"] = status
 
-        orders = make_request("orders", params=params)
-        result = [Order(**order) for order in orders]
-        logger.info(f"Retrieved {len(result)} orders")
+        if all_pages:
+            orders = await fetch_all_pages("orders", params=params, per_page=per_page)
+        else:
+            orders = await make_request("orders", params={"per_page": per_page, **params})
+        result = orders_result(orders, fields)
+        logger.debug("Retrieved %d orders", len(orders))
         return result
     except Exception as e:
-        logger.error(f"Error in list_orders: {e}")
-        return []
+        logger.error("Error in list_orders: %s", e)
+        raise
+
+@mcp.tool()
+async def summarize_orders(date_from: str, date_to: str, group_by: str = "status", statuses: Optional[List[str]] = None, top_products: int = 10, limit: int = 50) -> OrdersSummary:
+    """Summarize orders created between date_from and date_to (YYYY-MM-DD, UTC; a plain date_to includes that day, or ISO 8601 datetimes) without listing them. Returns order count, revenue and units overall and per group (group_by: status, day, week, month, customer or product; at most limit groups), plus the top_products by revenue. Filter with statuses, e.g. ["completed", "processing"] for paid sales. Use this instead of paging through list_orders to add up totals."""
+    try:
+        logger.debug("Summarizing orders %s to %s by %s", date_from, date_to, group_by)
+        return await order_analytics.summarize(date_from, date_to, group_by=group_by, statuses=statuses,
+                                               top_products=top_products, limit=limit)
+    except Exception as e:
+        logger.error("Error in summarize_orders: %s", e)
+        raise
+
+@mcp.tool()
+async def export_products(ctx: Context, per_page: int = EXPORT_PAGE_SIZE, fields: Optional[List[str]] = None) -> ExportSummary:
+    """Export every product. Records are streamed as NDJSON chunks (one per page) in progress notifications, so the request must carry a progressToken; the result is only a summary."""
+    try:
+        logger.info("Exporting products, per_page %s", per_page)
+        return await export_with_progress(ctx, "products", per_page=per_page, fields=fields)
+    except Exception as e:
+        logger.error("Error in export_products: %s", e)
+        raise
+
+@mcp.tool()
+async def export_orders(ctx: Context, status: Optional[str] = None, per_page: int = EXPORT_PAGE_SIZE, fields: Optional[List[str]] = None) -> ExportSummary:
+    """Export every order, optionally filtered by status. Records are streamed as NDJSON chunks (one per page) in progress notifications, so the request must carry a progressToken; the result is only a summary."""
+    try:
+        logger.info("Exporting orders with status=%s, per_page %s", status, per_page)
+        params = {"status": status} if status else None
+        return await export_with_progress(ctx, "orders", params=params, per_page=per_page, fields=fields)
+    except Exception as e:
+        logger.error("Error in export_orders: %s", e)
+        raise
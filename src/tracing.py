@@ -0,0 +1,290 @@
+import atexit
+import contextlib
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from . import jsonutil
+from .config import TRACE_EXPORTER, TRACE_SLOW_MS, logger
+from .logs import request_id_var
+
+# OpenTelemetry is optional; with TRACE_EXPORTER=otel finished spans are replayed into its tracer
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+_TRACEPARENT_RE = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+# Long-lived GET responses (the MCP event stream, NDJSON exports); their length is not latency
+_STREAMING_TYPES = (b"text/event-stream", b"application/x-ndjson")
+
+class Span:
+    """One timed step of a request; attribute names follow OpenTelemetry conventions where one exists"""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attributes", "start_ns", "end_ns", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+        trace.spans.append(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "status": {"code": "ERROR", "message": self.error} if self.error else {"code": "OK"},
+        }
+
+class Trace:
+    """Spans of one HTTP request, exported together when its root span ends"""
+
+    def __init__(self, trace_id: Optional[str] = None, request_id: Optional[str] = None):
+        self.trace_id = trace_id or os.urandom(16).hex()
+        # Correlation ID sent upstream and returned to the client; the caller's X-Request-ID if it sent one
+        self.request_id = request_id or self.trace_id
+        self.spans: List[Span] = []
+
+    def breakdown(self) -> str:
+        """Indented span tree with each span's offset and duration"""
+        children: Dict[Optional[str], List[Span]] = {}
+        for span in self.spans:
+            children.setdefault(span.parent_id, []).append(span)
+        start = self.spans[0].start_ns
+        lines: List[str] = []
+
+        def walk(parent_id: Optional[str], depth: int):
+            for span in sorted(children.get(parent_id, []), key=lambda s: s.start_ns):
+                details = " ".join(f"{k}={v}" for k, v in span.attributes.items())
+                lines.append(f"  {'  ' * depth}{span.name} +{(span.start_ns - start) / 1e6:.1f}ms "
+                             f"{span.duration_ms:.1f}ms {details}{' ERROR ' + span.error if span.error else ''}".rstrip())
+                walk(span.span_id, depth + 1)
+
+        walk(self.spans[0].parent_id, 0)
+        return "\n".join(lines)
+
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+@contextlib.contextmanager
+def span(name: str, parent: Optional[Span] = None, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Time a child of `parent` (default: the current span); a no-op outside a traced request"""
+    parent = parent or _current.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(parent.trace, name, parent.span_id, attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.end_ns = time.time_ns()
+        _current.reset(token)
+
+def upstream_headers() -> Dict[str, str]:
+    """Correlation headers for the WooCommerce request made in the current span"""
+    current = _current.get()
+    if current is None:
+        return {}
+    return {
+        "X-Request-ID": current.trace.request_id,
+        "traceparent": f"00-{current.trace.trace_id}-{current.span_id}-01",
+    }
+
+# Finished traces waiting for the exporter thread; when it falls this far behind, new traces are dropped
+_EXPORT_QUEUE_SIZE = 10000
+_export_queue: "queue.Queue[Optional[Trace]]" = queue.Queue(_EXPORT_QUEUE_SIZE)
+_export_thread: Optional[threading.Thread] = None
+_counts = {"exported": 0, "dropped": 0, "errors": 0}
+
+def _export(trace: Trace, output: Optional[Any]):
+    if output is not None:
+        output.write(jsonutil.dumps({"request_id": trace.request_id, "spans": [s.to_dict() for s in trace.spans]}) + "\n")
+    elif TRACE_EXPORTER == "otel" and otel_trace is not None:
+        tracer = otel_trace.get_tracer("woocommerce-mcp")
+        started = {}
+        for s in sorted(trace.spans, key=lambda s: s.start_ns):
+            parent = started.get(s.parent_id)
+            context = otel_trace.set_span_in_context(parent) if parent is not None else None
+            started[s.span_id] = tracer.start_span(s.name, context=context, start_time=s.start_ns,
+                                                   attributes={**s.attributes, "request_id": trace.request_id})
+            if s.error:
+                started[s.span_id].set_status(otel_trace.Status(otel_trace.StatusCode.ERROR, s.error))
+        for s in trace.spans:
+            started[s.span_id].end(end_time=s.end_ns)
+
+def _export_worker():
+    """Exporter thread: writes traces off the event loop, flushing whenever the queue runs empty"""
+    output = None
+    if TRACE_EXPORTER == "stdout":
+        output = sys.stdout
+    elif TRACE_EXPORTER.startswith("file:"):
+        output = open(TRACE_EXPORTER[len("file:"):], "a")
+    try:
+        while True:
+            trace = _export_queue.get()
+            if trace is None:
+                break
+            try:
+                _export(trace, output)
+                _counts["exported"] += 1
+            except Exception as e:
+                _counts["errors"] += 1
+                logger.error("Trace export failed: %s", e)
+            if output is not None and _export_queue.empty():
+                output.flush()
+    finally:
+        if output is not None and output is not sys.stdout:
+            output.close()
+
+def _stop_exporter():
+    """Flush the traces still queued at shutdown"""
+    if _export_thread is not None:
+        _export_queue.put(None)
+        _export_thread.join(timeout=5)
+
+def _enqueue(trace: Trace):
+    global _export_thread
+    if TRACE_EXPORTER == "none":
+        return
+    if _export_thread is None:
+        _export_thread = threading.Thread(target=_export_worker, name="trace-exporter", daemon=True)
+        _export_thread.start()
+        atexit.register(_stop_exporter)
+    try:
+        _export_queue.put_nowait(trace)
+    except queue.Full:
+        _counts["dropped"] += 1
+
+def finish(trace: Trace):
+    """Queue a finished trace for export and log its breakdown when the request was slow
+
+    Streaming GETs are judged by their time to first byte instead of their
+    total duration, which is however long the client kept the stream open.
+    """
+    root = trace.spans[0]
+    elapsed_ms = root.attributes.get("http.time_to_first_byte_ms", 0.0) if root.attributes.get("http.streaming") else root.duration_ms
+    if TRACE_SLOW_MS > 0 and elapsed_ms >= TRACE_SLOW_MS:
+        logger.warning("Slow request %s: %.0fms\n%s", trace.request_id, elapsed_ms, trace.breakdown())
+    _enqueue(trace)
+
+def stats() -> Dict[str, int]:
+    return {**_counts, "queued": _export_queue.qsize()}
+
+def _incoming(scope: Scope) -> Dict[str, str]:
+    headers = {}
+    for name, value in scope["headers"]:
+        if name in (b"traceparent", b"x-request-id"):
+            headers[name.decode()] = value.decode("latin-1")
+    return headers
+
+def _with_request_id(send: Send, request_id: str) -> Send:
+    """`send` adding an X-Request-ID response header"""
+    async def wrapped(message: Message):
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": [*message.get("headers", []), (b"x-request-id", request_id.encode())]}
+        await send(message)
+    return wrapped
+
+class TracingMiddleware:
+    """Root span per HTTP request; the outermost layer, so auth and session handling are inside it
+
+    MCP tool calls run in the session's own task, so the root span and the
+    request ID are also left in `scope["state"]` for WooMCP. With tracing
+    disabled the request ID is still assigned, for log correlation.
+    """
+
+    def __init__(self, app: ASGIApp, enabled: bool = True):
+        self.app = app
+        self.enabled = enabled
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = _incoming(scope)
+        state = scope.setdefault("state", {})
+        if not self.enabled:
+            request_id = state["request_id"] = incoming.get("x-request-id") or os.urandom(16).hex()
+            id_token = request_id_var.set(request_id)
+            try:
+                await self.app(scope, receive, _with_request_id(send, request_id))
+            finally:
+                request_id_var.reset(id_token)
+            return
+
+        match = _TRACEPARENT_RE.match(incoming.get("traceparent", ""))
+        trace = Trace(match.group(1) if match else None, incoming.get("x-request-id"))
+        root = Span(trace, "http.request", match.group(2) if match else None,
+                    {"http.method": scope["method"], "http.route": scope["path"]})
+        state["trace_span"] = root
+        state["request_id"] = trace.request_id
+        token = _current.set(root)
+        id_token = request_id_var.set(trace.request_id)
+
+        async def send_with_status(message: Message):
+            if message["type"] == "http.response.start":
+                root.set(**{"http.status_code": message["status"]})
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                if scope["method"] == "GET" and content_type.startswith(_STREAMING_TYPES):
+                    root.set(**{"http.streaming": True})
+            elif message["type"] == "http.response.body" and "http.time_to_first_byte_ms" not in root.attributes:
+                root.set(**{"http.time_to_first_byte_ms": round(root.duration_ms, 3)})
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _with_request_id(send_with_status, trace.request_id))
+        except BaseException as e:
+            root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            root.end_ns = time.time_ns()
+            _current.reset(token)
+            request_id_var.reset(id_token)
+            finish(trace)
+
+class TracedApp:
+    """Child span around a mounted ASGI app; calls that run in other tasks (MCP tools) take it as their parent"""
+
+    def __init__(self, app: ASGIApp, name: str):
+        self.app = app
+        self.name = name
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with span(self.name, **{"http.route": scope["path"]}) as current:
+            if current is not None:
+                scope.setdefault("state", {})["trace_span"] = current
+            await self.app(scope, receive, send)
@@ -1,28 +1,376 @@
-import requests
-from typing import Dict, Optional
-from .config import WOO_URL, WOO_CONSUMER_KEY, WOO_CONSUMER_SECRET, logger
+import asyncio
+import random
+import time
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+import httpx
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+from . import jsonutil
+from .cache import response_cache, make_key, resource_of
+from .singleflight import SingleFlight
+from .ratelimit import UpstreamLimiter
+from .breaker import CircuitBreaker, CircuitOpenError
+from .metrics import UPSTREAM_DURATION, UPSTREAM_REQUESTS, endpoint_label
+from .tracing import span, upstream_headers
+from .config import (
+    WOO_URL, WOO_CONSUMER_KEY, WOO_CONSUMER_SECRET,
+    WOO_TIMEOUT, WOO_CONNECT_TIMEOUT, WOO_POOL_SIZE,
+    WOO_KEEPALIVE_CONNECTIONS, WOO_KEEPALIVE_EXPIRY, PAGINATION_CONCURRENCY,
+    WOO_MAX_RETRIES, WOO_RETRY_BACKOFF, WOO_RETRY_MAX_WAIT, logger
+)
 
-def make_request(endpoint: str, method: str = "GET", params: Optional[Dict] = None, data: Optional[Dict] = None) -> Dict:
-    """Make authenticated request to WooCommerce API"""
+SUPPORTED_METHODS = ("GET", "POST", "PUT", "DELETE")
+# Statuses worth another attempt for idempotent GETs
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# WooCommerce rejects per_page above 100
+MAX_PER_PAGE = 100
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Parse Retry-After as delta-seconds or an HTTP date"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
     try:
-        url = f"{WOO_URL}/wp-json/wc/v3/{endpoint}"
-        auth = (WOO_CONSUMER_KEY, WOO_CONSUMER_SECRET)
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
 
-        logger.info(f"Making {method} request to {url}")
+def store_unavailable(error: BaseException) -> bool:
+    """Errors that say the store is down or overloaded rather than anything about the requested data"""
+    if isinstance(error, (CircuitOpenError, httpx.TransportError)):
+        return True
+    return isinstance(error, httpx.HTTPStatusError) and (
+        error.response.status_code >= 500 or error.response.status_code == 429
+    )
 
-        if method == "GET":
-            response = requests.get(url, auth=auth, params=params, timeout=30)
-        elif method == "POST":
-            response = requests.post(url, auth=auth, json=data, timeout=30)
-        else:
+class Page(NamedTuple):
+    """One page of a WooCommerce listing with the totals from its response headers"""
+    items: List[Dict]
+    total: Optional[int]
+    total_pages: Optional[int]
+
+class WooClient:
+    """Long-lived async WooCommerce REST client sharing one keep-alive connection pool"""
+
+    def __init__(
+        self,
+        base_url: str = WOO_URL,
+        consumer_key: Optional[str] = WOO_CONSUMER_KEY,
+        consumer_secret: Optional[str] = WOO_CONSUMER_SECRET,
+        timeout: float = WOO_TIMEOUT,
+        connect_timeout: float = WOO_CONNECT_TIMEOUT,
+        pool_size: int = WOO_POOL_SIZE,
+        keepalive_connections: int = WOO_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = WOO_KEEPALIVE_EXPIRY,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        limiter: Optional[UpstreamLimiter] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        max_retries: int = WOO_MAX_RETRIES,
+        retry_backoff: float = WOO_RETRY_BACKOFF,
+        retry_max_wait: float = WOO_RETRY_MAX_WAIT,
+    ):
+        self.limiter = limiter or UpstreamLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.retry_max_wait = retry_max_wait
+        self.retries: Dict[str, int] = {}
+        self.pool_size = pool_size
+        self.base_url = f"{base_url.rstrip('/')}/wp-json/wc/v3/"
+        self._http = httpx.AsyncClient(
+            base_url=self.base_url,
+            auth=(consumer_key or "", consumer_secret or ""),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            transport=transport,
+        )
+
+    @property
+    def is_closed(self) -> bool:
+        return self._http.is_closed
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.retry_max_wait, self.retry_backoff * (2 ** attempt)))
+
+    def _count_retry(self, reason: str):
+        self.retries[reason] = self.retries.get(reason, 0) + 1
+
+    async def request(self, endpoint: str, method: str = "GET", params: Optional[Dict] = None, data: Optional[Dict] = None,
+                      headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """Send a request through the limiter and raise for non-2xx responses
+
+        GETs are retried on 429/5xx and transport errors with jittered exponential
+        backoff, waiting at least as long as the store's Retry-After. A 429 with
+        Retry-After also pauses every other upstream request for that long.
+        Every attempt goes through the circuit breaker, so once it opens the
+        call fails fast with CircuitOpenError.
+        """
+        method = method.upper()
+        if method not in SUPPORTED_METHODS:
             raise ValueError(f"Unsupported method: {method}")
 
-        response.raise_for_status()
-        logger.info(f"Request successful, status: {response.status_code}")
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Request failed for endpoint {endpoint}: {e}")
+        # Bodies are only sent for writes; DELETE takes its options (e.g. force) as params
+        json_body = data if method in ("POST", "PUT") else None
+        attempt = 0
+        while True:
+            probe = self.breaker.allow()
+            try:
+                async with self.limiter:
+                    started = time.monotonic()
+                    response = await self._http.request(method, endpoint, params=params, json=json_body, headers=headers)
+                self.breaker.record(response.status_code < 500, time.monotonic() - started)
+            except httpx.TransportError as e:
+                self.breaker.record(False)
+                if method != "GET" or attempt >= self.max_retries:
+                    raise
+                reason, delay = type(e).__name__, self._backoff(attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response
+                retry_after = retry_after_seconds(response)
+                if response.status_code == 429 and retry_after is not None:
+                    self.limiter.pause(min(retry_after, self.retry_max_wait))
+                if (method != "GET" or attempt >= self.max_retries
+                        or (retry_after is not None and retry_after > self.retry_max_wait)):
+                    response.raise_for_status()
+                reason = str(response.status_code)
+                delay = max(retry_after or 0.0, self._backoff(attempt))
+            finally:
+                if probe:
+                    self.breaker.end_probe()
+
+            self._count_retry(reason)
+            attempt += 1
+            logger.warning("Retrying %s %s after %s (attempt %d/%d, waiting %.2fs)", method, endpoint, reason, attempt, self.max_retries, delay)
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"limiter": self.limiter.stats(), "breaker": self.breaker.stats(), "pool": self.pool_stats(),
+                "retries": dict(self.retries)}
+
+    def pool_stats(self) -> Dict[str, int]:
+        """Connection pool utilization (zero connections for custom transports without a pool)"""
+        pool = getattr(getattr(self._http, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        return {
+            "max_connections": self.pool_size,
+            "connections": len(connections),
+            "idle": sum(1 for connection in connections if connection.is_idle()),
+        }
+
+    async def aclose(self):
+        await self._http.aclose()
+
+_client: Optional[WooClient] = None
+
+# Identical concurrent GETs share one upstream request
+inflight_requests = SingleFlight()
+
+# Age in seconds of the oldest stale response served during the current tool call, read by results.py
+stale_age: ContextVar[Optional[float]] = ContextVar("stale_age", default=None)
+
+# Background refreshes of stale cache entries, one per key
+_revalidations: Dict[str, asyncio.Task] = {}
+
+def get_client() -> WooClient:
+    """Return the shared client, creating it on first use outside the server lifespan"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = WooClient()
+    return _client
+
+async def init_client(client: Optional[WooClient] = None) -> WooClient:
+    """Install the shared client; called from the server lifespan"""
+    global _client
+    if _client is not None and _client is not client:
+        await _client.aclose()
+    _client = client or WooClient()
+    logger.info("WooCommerce client ready (pool size %d, timeout %ss)", WOO_POOL_SIZE, WOO_TIMEOUT)
+    return _client
+
+async def close_client():
+    """Close the shared client and release pooled connections"""
+    global _client
+    for task in list(_revalidations.values()):
+        task.cancel()
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+async def _send(endpoint: str, method: str, params: Optional[Dict], data: Optional[Dict]) -> Tuple[Any, int, httpx.Headers]:
+    """Send one upstream request; returns the decoded body, its size in bytes and the headers"""
+    client = get_client()
+    logger.debug("Making %s request to %s", method, endpoint)
+
+    started = time.perf_counter()
+    status = "error"
+    label = endpoint_label(endpoint)
+    with span("woo.request", **{"http.method": method, "woo.endpoint": label}) as current:
+        try:
+            response = await client.request(endpoint, method=method, params=params, data=data, headers=upstream_headers())
+            status = str(response.status_code)
+        except httpx.HTTPStatusError as e:
+            status = str(e.response.status_code)
+            raise
+        except CircuitOpenError:
+            status = "circuit_open"
+            raise
+        except httpx.TransportError as e:
+            status = type(e).__name__
+            raise
+        finally:
+            UPSTREAM_REQUESTS.inc(method=method, endpoint=label, status=status)
+            UPSTREAM_DURATION.observe(time.perf_counter() - started, method=method, endpoint=label)
+            if current is not None:
+                current.set(**{"http.status_code": status})
+
+        logger.debug("Request successful, status: %s", response.status_code)
+        with span("json.decode", bytes=len(response.content)):
+            result = jsonutil.loads(response.content)
+    return result, len(response.content), response.headers
+
+def _flight_key(key: str, generation: int) -> str:
+    """Coalescing key for a GET; a write to the resource changes it, so later readers don't join a pre-write request"""
+    return f"{key}#{generation}"
+
+async def _revalidate(key: str, endpoint: str, params: Optional[Dict]):
+    """Refresh a stale cache entry once the circuit lets requests through again"""
+    await asyncio.sleep(get_client().breaker.retry_in())
+    generation = response_cache.generation(endpoint)
+    try:
+        result, size, _ = await inflight_requests.do(_flight_key(key, generation), lambda: _send(endpoint, "GET", params, None))
+    except Exception as e:
+        logger.info("Background refresh of %s failed: %s", key, e)
+        return
+    response_cache.set(key, result, size, generation=generation)
+    logger.info("Background refresh of %s succeeded", key)
+
+def _serve_stale(key: str, endpoint: str, params: Optional[Dict], error: BaseException) -> Optional[Any]:
+    """Last known good response for a GET the store could not answer, scheduling a background refresh"""
+    stale = response_cache.get_stale(key)
+    if stale is None:
+        return None
+    value, age = stale
+    current = stale_age.get()
+    stale_age.set(age if current is None else max(current, age))
+    logger.warning("Serving stale %s (%.0fs old): %s", key, age, error)
+    if key not in _revalidations:
+        task = asyncio.create_task(_revalidate(key, endpoint, params))
+        _revalidations[key] = task
+        task.add_done_callback(lambda _: _revalidations.pop(key, None))
+    return value
+
+def _header_int(headers: httpx.Headers, name: str) -> Optional[int]:
+    value = headers.get(name)
+    return int(value) if value and value.isdigit() else None
+
+async def make_request(endpoint: str, method: str = "GET", params: Optional[Dict] = None, data: Optional[Dict] = None, use_cache: bool = True) -> Dict:
+    """Make authenticated request to WooCommerce API
+
+    GET responses are served from and stored in the response cache, and
+    identical concurrent GETs are coalesced into a single upstream call. When
+    the store is unavailable a cached GET is served stale (see `stale_age`).
+    Successful writes invalidate cached listings of the written resource and
+    write the returned item through to the cache.
+    """
+    try:
+        method = method.upper()
+        if method == "GET":
+            key = make_key(endpoint, params)
+            if use_cache:
+                cached = response_cache.get(key)
+                if cached is not None:
+                    logger.debug("Cache hit for %s", key)
+                    return cached
+
+            # Captured before the request: a write landing while it runs makes its response unfit for the cache
+            generation = response_cache.generation(endpoint)
+            try:
+                result, size, _ = await inflight_requests.do(_flight_key(key, generation),
+                                                             lambda: _send(endpoint, method, params, data))
+            except (httpx.HTTPError, CircuitOpenError) as e:
+                stale = _serve_stale(key, endpoint, params, e) if use_cache and store_unavailable(e) else None
+                if stale is None:
+                    raise
+                return stale
+            if use_cache:
+                response_cache.set(key, result, size, generation=generation)
+            return result
+
+        result, size, _ = await _send(endpoint, method, params, data)
+        response_cache.invalidate(endpoint)
+        path = endpoint.strip("/")
+        if method in ("POST", "PUT") and path.count("/") <= 1 and isinstance(result, dict) and "id" in result:
+            response_cache.set(f"{resource_of(path)}/{result['id']}", result, size)
+        return result
+    except (httpx.HTTPError, CircuitOpenError) as e:
+        logger.error("Request failed for endpoint %s: %s", endpoint, e)
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in make_request: {e}")
+        logger.error("Unexpected error in make_request: %s", e)
+        raise
+
+async def fetch_page(endpoint: str, params: Optional[Dict] = None) -> Page:
+    """Fetch one listing page uncached, keeping the X-WP-Total/X-WP-TotalPages headers"""
+    try:
+        key = make_key(endpoint, params)
+        result, _, headers = await inflight_requests.do(_flight_key(key, response_cache.generation(endpoint)),
+                                                        lambda: _send(endpoint, "GET", params, None))
+        return Page(result, _header_int(headers, "X-WP-Total"), _header_int(headers, "X-WP-TotalPages"))
+    except (httpx.HTTPError, CircuitOpenError) as e:
+        logger.error("Request failed for endpoint %s: %s", endpoint, e)
         raise
+
+async def iter_pages(endpoint: str, params: Optional[Dict] = None, per_page: int = 100, start_page: int = 1) -> AsyncIterator[Page]:
+    """Walk every page of a listing in order, holding one page in memory at a time"""
+    page_number = start_page
+    while True:
+        page = await fetch_page(endpoint, {**(params or {}), "per_page": per_page, "page": page_number})
+        yield page
+        if page.total_pages is not None:
+            if page_number >= page.total_pages:
+                break
+        elif len(page.items) < per_page:
+            break
+        page_number += 1
+
+async def fetch_all_pages(endpoint: str, params: Optional[Dict] = None, per_page: int = 100,
+                          concurrency: int = PAGINATION_CONCURRENCY) -> List[Dict]:
+    """Fetch every page of a listing and return the items in page order
+
+    Page 1 is fetched first to learn X-WP-TotalPages; the remaining pages are
+    then fetched concurrently, at most `concurrency` at a time. Without the
+    header the pages are walked sequentially until a short page.
+    """
+    per_page = min(per_page, MAX_PER_PAGE)
+    base = {**(params or {}), "per_page": per_page}
+    first = await fetch_page(endpoint, {**base, "page": 1})
+    items = list(first.items)
+
+    if first.total_pages is None:
+        if len(first.items) >= per_page:
+            async for page in iter_pages(endpoint, params, per_page=per_page, start_page=2):
+                items.extend(page.items)
+        return items
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch(page_number: int) -> List[Dict]:
+        async with semaphore:
+            return (await fetch_page(endpoint, {**base, "page": page_number})).items
+
+    pages = await asyncio.gather(*(fetch(n) for n in range(2, first.total_pages + 1)))
+    for page_items in pages:
+        items.extend(page_items)
+    logger.debug("Fetched %d %s across %d pages", len(items), endpoint, first.total_pages)
+    return items
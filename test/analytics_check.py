@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Verificación de la caché de agregados diarios de summarize_orders.
+
+Contra la tienda falsa de bench/ (un pedido por hora desde 2024-01-01),
+servida en memoria:
+
+- el primer resumen de un rango descarga sus días;
+- repetirlo reutiliza los días en caché sin ninguna petición a la tienda;
+- un webhook firmado de un pedido modificado invalida solo el día en que se
+  creó el pedido, y el siguiente resumen descarga ese día y refleja el cambio.
+
+No necesita una tienda real ni el servidor corriendo:
+
+    python test/analytics_check.py
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import sys
+from decimal import Decimal
+
+SECRET = "secreto-de-prueba"
+os.environ.setdefault("WOO_URL", "http://fake-store.local")
+os.environ.setdefault("WOO_CONSUMER_KEY", "ck_fake")
+os.environ.setdefault("WOO_CONSUMER_SECRET", "cs_fake")
+os.environ["WOO_WEBHOOK_SECRET"] = SECRET
+os.environ["CACHE_ENABLED"] = "false"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bench"))
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from fake_woo import FakeStore  # noqa: E402
+from src.analytics import order_analytics  # noqa: E402
+from src.sync import WEBHOOK_PATH, router  # noqa: E402
+from src.woo_client import WooClient, init_client, close_client  # noqa: E402
+
+DATE_FROM, DATE_TO = "2024-01-01", "2024-01-10"
+# Pedido 30: creado el 2024-01-02 a las 06:00
+ORDER_ID = 30
+
+
+def signed(payload: dict) -> tuple:
+    body = json.dumps(payload).encode()
+    signature = base64.b64encode(hmac.new(SECRET.encode(), body, hashlib.sha256).digest()).decode()
+    return body, {"X-WC-Webhook-Topic": "order.updated", "X-WC-Webhook-Signature": signature,
+                  "Content-Type": "application/json"}
+
+
+async def main() -> bool:
+    store = FakeStore(products=50, orders=400, latency_ms=1, jitter_ms=0)
+    await init_client(WooClient(transport=httpx.ASGITransport(store.app())))
+    app = FastAPI()
+    app.include_router(router)
+    try:
+        first = await order_analytics.summarize(DATE_FROM, DATE_TO, group_by="day")
+        requests = store.stats["requests"]
+        again = await order_analytics.summarize(DATE_FROM, DATE_TO, group_by="day")
+        reused = again.days_fetched == 0 and again.days_cached == first.days_fetched and store.stats["requests"] == requests
+        print(f"  primer resumen     {first.orders} pedidos, {first.days_fetched} días descargados")
+        print(f"  repetido           {again.days_cached} días en caché, {again.days_fetched} descargados, "
+              f"{store.stats['requests'] - requests} peticiones  {'OK' if reused else 'FALLO'}")
+
+        order = store.orders_by_id[ORDER_ID]
+        old_total = Decimal(order["total"])
+        order["total"] = "1000.00"
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://localhost:8000") as client:
+            body, headers = signed(order)
+            hook = await client.post(WEBHOOK_PATH, content=body, headers=headers)
+        after = await order_analytics.summarize(DATE_FROM, DATE_TO, group_by="day")
+        expected = Decimal(str(first.revenue)) - old_total + Decimal("1000.00")
+        day = next((group for group in after.groups if group.key == order["date_created_gmt"][:10]), None)
+        invalidated = (hook.status_code == 200 and after.days_fetched == 1 and after.days_cached == first.days_fetched - 1
+                       and abs(Decimal(str(after.revenue)) - expected) < Decimal("0.01") and day is not None)
+        print(f"  tras el webhook    {hook.status_code}  {after.days_fetched} día descargado ({order['date_created_gmt'][:10]}), "
+              f"{after.days_cached} en caché, ingresos {first.revenue} -> {after.revenue}  {'OK' if invalidated else 'FALLO'}")
+        return reused and invalidated
+    finally:
+        await close_client()
+
+
+if __name__ == "__main__":
+    print(f"Resumen de pedidos del {DATE_FROM} al {DATE_TO} agrupado por día:")
+    sys.exit(0 if asyncio.run(main()) else 1)
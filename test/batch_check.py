@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Verificación de los lotes JSON-RPC en /mcp.
+
+Monta la app MCP como en el servidor (sesiones compartidas delante de
+BatchRequests) y envía cuatro lotes:
+
+- mixto: dos llamadas válidas, una herramienta desconocida, un elemento
+  inválido, un initialize (que no se puede agrupar) y una notificación;
+  cada petición debe tener su respuesta y la notificación ninguna;
+- solo notificaciones: 202 sin cuerpo;
+- sesión desconocida: 404 para el lote entero;
+- Accept sin text/event-stream: 406 de la primera subpetición, para el lote entero.
+
+La tienda se simula con un transporte en memoria; no necesita una tienda
+real ni el servidor corriendo:
+
+    python test/batch_check.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+os.environ.setdefault("WOO_URL", "http://fake-store.local")
+os.environ.setdefault("WOO_CONSUMER_KEY", "ck_fake")
+os.environ.setdefault("WOO_CONSUMER_SECRET", "cs_fake")
+os.environ["MCP_STATELESS"] = "true"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx  # noqa: E402
+from src.batch import BatchRequests  # noqa: E402
+from src.sessions import SharedSessions, create_session_store  # noqa: E402
+from src.tools import mcp  # noqa: E402
+from src.woo_client import WooClient, init_client, close_client  # noqa: E402
+
+HEADERS = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+INITIALIZE = {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {
+    "protocolVersion": "2025-03-26", "capabilities": {}, "clientInfo": {"name": "check", "version": "1"}}}
+INITIALIZED = {"jsonrpc": "2.0", "method": "notifications/initialized"}
+
+
+def store(request: httpx.Request) -> httpx.Response:
+    """Pedidos 1 a 9 existen; cualquier otra ruta responde 404"""
+    order_id = request.url.path.rsplit("/", 1)[-1]
+    if "/orders/" in request.url.path and order_id.isdigit() and 0 < int(order_id) < 10:
+        return httpx.Response(200, json={"id": int(order_id), "status": "processing", "total": "10.00",
+                                         "customer_id": 1, "line_items": []})
+    return httpx.Response(404, json={"code": "woocommerce_rest_invalid_id", "message": "Invalid ID."})
+
+
+def call(request_id: int, name: str, arguments: dict) -> dict:
+    return {"jsonrpc": "2.0", "id": request_id, "method": "tools/call", "params": {"name": name, "arguments": arguments}}
+
+
+def replies(response: httpx.Response) -> dict:
+    """Mensajes JSON-RPC del flujo SSE indexados por id"""
+    messages = {}
+    for line in response.text.splitlines():
+        if line.startswith("data:") and line[5:].strip():
+            message = json.loads(line[5:])
+            messages[message.get("id")] = message
+    return messages
+
+
+async def check_mixed(client: httpx.AsyncClient, headers: dict) -> bool:
+    batch = [
+        call(10, "get_order", {"order_id": 1}),
+        call(11, "get_order", {"order_id": 2}),
+        call(12, "no_existe", {}),
+        42,
+        {**INITIALIZE, "id": 13},
+        INITIALIZED,
+    ]
+    response = await client.post("/mcp", json=batch, headers=headers)
+    got = replies(response)
+    valid = all(not got.get(i, {}).get("result", {"isError": True}).get("isError") for i in (10, 11))
+    unknown = got.get(12, {}).get("result", {}).get("isError") is True or "error" in got.get(12, {})
+    invalid = got.get(None, {}).get("error", {}).get("code") == -32600
+    initialize = got.get(13, {}).get("error", {}).get("code") == -32600
+    ok = response.status_code == 200 and valid and unknown and invalid and initialize and len(got) == 5
+    print(f"  mixto                {response.status_code}  respuestas {len(got)}  válidas {'sí' if valid else 'no'}  "
+          f"desconocida {'error' if unknown else '?'}  inválido {'error' if invalid else '?'}  "
+          f"initialize {'rechazado' if initialize else '?'}  {'OK' if ok else 'FALLO'}")
+    return ok
+
+
+async def check_notifications(client: httpx.AsyncClient, headers: dict) -> bool:
+    response = await client.post("/mcp", json=[INITIALIZED, INITIALIZED], headers=headers)
+    ok = response.status_code == 202 and not response.content
+    print(f"  solo notificaciones  {response.status_code}  {'OK' if ok else 'FALLO'}")
+    return ok
+
+
+async def check_bad_session(client: httpx.AsyncClient) -> bool:
+    headers = {**HEADERS, "Mcp-Session-Id": "sesion-inexistente"}
+    response = await client.post("/mcp", json=[call(20, "get_order", {"order_id": 1}), call(21, "get_order", {"order_id": 2})],
+                                 headers=headers)
+    ok = response.status_code == 404 and not replies(response)
+    print(f"  sesión desconocida   {response.status_code}  {'OK' if ok else 'FALLO'}")
+    return ok
+
+
+async def check_bad_accept(client: httpx.AsyncClient, headers: dict) -> bool:
+    response = await client.post("/mcp", json=[call(30, "get_order", {"order_id": 1}), call(31, "get_order", {"order_id": 2})],
+                                 headers={**headers, "Accept": "text/html"})
+    ok = response.status_code == 406 and not replies(response)
+    print(f"  Accept inválido      {response.status_code}  {'OK' if ok else 'FALLO'}")
+    return ok
+
+
+async def main() -> bool:
+    await init_client(WooClient(transport=httpx.MockTransport(store)))
+    app = SharedSessions(BatchRequests(mcp.streamable_http_app()), create_session_store("memory"))
+    try:
+        async with mcp.session_manager.run():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://localhost:8000") as client:
+                opened = await client.post("/mcp", json=INITIALIZE, headers=HEADERS)
+                headers = {**HEADERS, "Mcp-Session-Id": opened.headers.get("mcp-session-id", "")}
+                await client.post("/mcp", json=INITIALIZED, headers=headers)
+                results = [
+                    await check_mixed(client, headers),
+                    await check_notifications(client, headers),
+                    await check_bad_session(client),
+                    await check_bad_accept(client, headers),
+                ]
+    finally:
+        await close_client()
+    return all(results)
+
+
+if __name__ == "__main__":
+    print("Lotes JSON-RPC en /mcp:")
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Verificación de concurrencia de las herramientas MCP.
+
+Simula una tienda WooCommerce lenta (latencia fija por petición) y lanza N
+llamadas concurrentes a las herramientas a través de FastMCP. Como las
+herramientas son corrutinas sobre el cliente async, las N llamadas deben
+terminar aproximadamente en el tiempo de una sola.
+
+No necesita una tienda real ni el servidor corriendo:
+
+    python test/concurrency_check.py [N] [latencia_segundos]
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# Credenciales ficticias: la tienda se simula con un transporte en memoria
+os.environ.setdefault("WOO_URL", "http://fake-store.local")
+os.environ.setdefault("WOO_CONSUMER_KEY", "ck_fake")
+os.environ.setdefault("WOO_CONSUMER_SECRET", "cs_fake")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx  # noqa: E402
+from src.tools import mcp  # noqa: E402
+from src.woo_client import WooClient, init_client, close_client  # noqa: E402
+
+PRODUCT = {
+    "id": 1,
+    "name": "Producto de prueba",
+    "price": "10.00",
+    "regular_price": "10.00",
+    "sale_price": "",
+    "stock_status": "instock",
+    "categories": [],
+}
+
+
+def slow_store(latency: float):
+    """Crear un handler que responde tras `latency` segundos"""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json=[PRODUCT])
+
+    return handler
+
+
+async def run(n: int, latency: float) -> bool:
+    await init_client(WooClient(transport=httpx.MockTransport(slow_store(latency)), pool_size=n))
+    try:
+        # Cada llamada usa argumentos distintos para que ninguna capa pueda reutilizar otra
+        start = time.perf_counter()
+        await mcp.call_tool("list_products", {"page": 1, "per_page": 1})
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            mcp.call_tool("list_products", {"page": i + 2, "per_page": 1}) for i in range(n)
+        ))
+        concurrent = time.perf_counter() - start
+    finally:
+        await close_client()
+
+    print(f"1 llamada:  {single:.3f}s")
+    print(f"{n} llamadas concurrentes: {concurrent:.3f}s (secuencial serían ~{single * n:.3f}s)")
+
+    # Margen generoso para el overhead de validación y planificación
+    ok = concurrent < single * 2
+    print("✅ Las llamadas no se bloquean entre sí" if ok else "❌ Las llamadas se están serializando")
+    return ok
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    sys.exit(0 if asyncio.run(run(n, latency)) else 1)
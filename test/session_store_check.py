@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Verificación de los almacenes de sesiones MCP compartidos.
+
+Para cada almacén (memoria, SQLite y Redis, este último contra un sustituto
+local mínimo del protocolo RESP) simula dos workers: dos instancias de
+SharedSessions con su propia conexión al almacén, delante de la misma app
+MCP. La sesión se abre en el worker A y se usa y se cierra en el worker B.
+
+No necesita una tienda real, ni Redis, ni el servidor corriendo:
+
+    python test/session_store_check.py
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("WOO_URL", "http://fake-store.local")
+os.environ.setdefault("WOO_CONSUMER_KEY", "ck_fake")
+os.environ.setdefault("WOO_CONSUMER_SECRET", "cs_fake")
+os.environ["MCP_STATELESS"] = "true"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx  # noqa: E402
+from src.sessions import SharedSessions, create_session_store  # noqa: E402
+from src.tools import mcp  # noqa: E402
+
+HEADERS = {"Accept": "application/json, text/event-stream", "Content-Type": "application/json"}
+INITIALIZE = {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {
+    "protocolVersion": "2025-03-26", "capabilities": {}, "clientInfo": {"name": "check", "version": "1"}}}
+LIST_TOOLS = {"jsonrpc": "2.0", "id": 2, "method": "tools/list"}
+
+
+async def resp_stand_in() -> asyncio.AbstractServer:
+    """Servidor mínimo que entiende SET/GETEX/DEL del protocolo de Redis"""
+    data = {}
+
+    async def handle(reader, writer):
+        while True:
+            header = await reader.readline()
+            if not header:
+                break
+            args = []
+            for _ in range(int(header[1:])):
+                length = int((await reader.readline())[1:])
+                args.append((await reader.readexactly(length + 2))[:-2])
+            command = args[0].upper()
+            if command == b"SET":
+                data[args[1]] = args[2]
+                writer.write(b"+OK\r\n")
+            elif command == b"GETEX":
+                value = data.get(args[1])
+                writer.write(b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value))
+            elif command == b"DEL":
+                writer.write(b":%d\r\n" % (data.pop(args[1], None) is not None))
+            else:
+                writer.write(b"-ERR unknown command\r\n")
+            await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+async def check(app, name: str, url: str) -> bool:
+    store_a, store_b = create_session_store(url), create_session_store(url)
+    if url == "memory":
+        store_b = store_a  # en memoria solo se comparte dentro del mismo proceso
+    worker_a = httpx.AsyncClient(transport=httpx.ASGITransport(SharedSessions(app, store_a)), base_url="http://localhost:8000")
+    worker_b = httpx.AsyncClient(transport=httpx.ASGITransport(SharedSessions(app, store_b)), base_url="http://localhost:8000")
+
+    opened = await worker_a.post("/mcp", json=INITIALIZE, headers=HEADERS)
+    session_id = opened.headers.get("mcp-session-id")
+    headers = {**HEADERS, "Mcp-Session-Id": session_id or ""}
+    listed = await worker_b.post("/mcp", json=LIST_TOOLS, headers=headers)
+    missing = await worker_b.post("/mcp", json=LIST_TOOLS, headers=HEADERS)
+    closed = await worker_b.delete("/mcp", headers=headers)
+    after = await worker_a.post("/mcp", json=LIST_TOOLS, headers=headers)
+
+    ok = (opened.status_code == 200 and session_id and listed.status_code == 200 and "list_products" in listed.text
+          and missing.status_code == 400 and closed.status_code == 200 and after.status_code == 404)
+    print(f"  {name:8} abrir {opened.status_code}  usar en otro worker {listed.status_code}  "
+          f"sin sesión {missing.status_code}  cerrar {closed.status_code}  tras cerrar {after.status_code}  "
+          f"{'OK' if ok else 'FALLO'}")
+    for store in {store_a, store_b}:
+        await store.close()
+    return ok
+
+
+async def main() -> bool:
+    server = await resp_stand_in()
+    port = server.sockets[0].getsockname()[1]
+    app = mcp.streamable_http_app()
+    with tempfile.TemporaryDirectory() as tmp:
+        async with mcp.session_manager.run():
+            results = [
+                await check(app, "memory", "memory"),
+                await check(app, "sqlite", f"sqlite:{os.path.join(tmp, 'sessions.db')}"),
+                await check(app, "redis", f"redis://127.0.0.1:{port}/0"),
+            ]
+    server.close()
+    return all(results)
+
+
+if __name__ == "__main__":
+    print("Sesión abierta en el worker A, usada y cerrada en el worker B:")
+    sys.exit(0 if asyncio.run(main()) else 1)